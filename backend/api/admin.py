@@ -1,3 +1,20 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        """  Put dead-lettered (or waiting) emails back at the front of the queue  """
+        updated = queryset.exclude(status__in=[OutgoingEmail.SENT, OutgoingEmail.SENDING]).update(
+            status=OutgoingEmail.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} emails queued again")
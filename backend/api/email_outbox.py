@@ -0,0 +1,146 @@
+"""
+Transactional email outbox.
+
+Requests never talk to SMTP. ``queue_email`` inserts an ``OutgoingEmail`` row
+in the caller's transaction, so an email exists exactly when the change that
+caused it commits. The ``send_queued_emails`` worker drains the table with
+``send_batch``:
+
+- claims due rows with ``SELECT ... FOR UPDATE SKIP LOCKED`` in a short
+  transaction, marking them ``sending`` for ``EMAIL_OUTBOX_LEASE_SECONDS``, so
+  several workers can run side by side and no row lock or transaction is held
+  while talking to SMTP;
+- sends the whole batch over one connection of ``EMAIL_BACKEND``, recording
+  each email's outcome as soon as it is known;
+- claims again emails whose lease ran out (the worker died mid-batch), so
+  delivery is at least once;
+- retries failures with exponential backoff (``EMAIL_OUTBOX_BACKOFF_SECONDS``,
+  doubling up to ``EMAIL_OUTBOX_MAX_BACKOFF_SECONDS``);
+- marks an email dead after ``EMAIL_OUTBOX_MAX_ATTEMPTS``, keeping the last
+  error for the admin.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    """ Queue an email for the worker; the send_mail replacement for request code """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(
+        settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS
+    ))
+
+
+def _record(email, **fields):
+    """
+    Store the outcome of one send, unless the lease ran out and another worker
+    has claimed the email since (it then has a higher attempt count).
+    """
+    OutgoingEmail.objects.filter(
+        id=email.id, status=OutgoingEmail.SENDING, attempts=email.attempts
+    ).update(**fields)
+
+
+def _failed(email, error, now):
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        logger.error(f" Email {email.id} to {email.recipients} dead after {email.attempts} attempts: {error}")
+        _record(email, status=OutgoingEmail.DEAD, last_error=error)
+    else:
+        logger.warning(f" Email {email.id} to {email.recipients} failed (attempt {email.attempts}): {error}")
+        _record(email, status=OutgoingEmail.PENDING, last_error=error, next_attempt_at=now + retry_delay(email.attempts))
+
+
+def claim(batch_size):
+    """
+    Lease up to ``batch_size`` due emails to this worker, in a transaction of its own.
+
+    Claimed rows are marked ``sending`` with ``next_attempt_at`` moved to the
+    end of the lease, and the attempt is counted up front. A worker that dies
+    mid-batch leaves its rows to be claimed again once the lease has expired.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[OutgoingEmail.PENDING, OutgoingEmail.SENDING], next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        # Expired leases that already used every attempt are not tried again
+        abandoned = [
+            email.id for email in emails
+            if email.status == OutgoingEmail.SENDING and email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        ]
+        if abandoned:
+            logger.error(f" Emails {abandoned} dead: worker stopped while sending the last attempt")
+            OutgoingEmail.objects.filter(id__in=abandoned).update(
+                status=OutgoingEmail.DEAD, last_error="worker stopped while sending"
+            )
+        emails = [email for email in emails if email.id not in abandoned]
+        lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        OutgoingEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            status=OutgoingEmail.SENDING, attempts=F("attempts") + 1, next_attempt_at=lease_until
+        )
+    for email in emails:
+        email.status = OutgoingEmail.SENDING
+        email.attempts += 1
+        email.next_attempt_at = lease_until
+    return emails, len(emails) + len(abandoned)
+
+
+def send_batch(batch_size=None):
+    """ Send up to ``batch_size`` due emails over one connection; returns how many were claimed """
+    emails, claimed = claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return claimed
+
+    # No transaction from here on: SMTP can take seconds per message
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        now = timezone.now()
+        for email in emails:
+            _failed(email, f"connection failed: {e}", now)
+        return claimed
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipients, connection=connection
+            )
+            try:
+                sent = message.send()
+            except Exception as e:
+                _failed(email, str(e), timezone.now())
+                # The connection may be unusable after an SMTP error; start a fresh one
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass  # send() opens one per message until the server is back
+                continue
+            if sent:
+                _record(email, status=OutgoingEmail.SENT, sent_at=timezone.now(), last_error="")
+            else:
+                _failed(email, "no recipients accepted", timezone.now())
+    finally:
+        connection.close()
+    return claimed
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.email_outbox import send_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails queued in the outbox, one connection per batch, with retries. "
+        "Runs until stopped unless --once is given; start as many workers as needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send what is due now and exit")
+        parser.add_argument("--batch-size", type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument("--poll", type=float, default=settings.EMAIL_OUTBOX_POLL_SECONDS,
+                            help="Seconds to wait when the outbox is empty")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            claimed = send_batch(options["batch_size"])
+            total += claimed
+            if claimed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Processed {total} queued emails"))
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_unread(apps, schema_editor):
+    CustomUser = apps.get_model('api', 'CustomUser')
+    Notification = apps.get_model('student', 'Notification')
+    OwnerNotification = apps.get_model('hostel_owner', 'OwnerNotification')
+
+    def unread(model):
+        counts = (
+            model.objects.filter(user=OuterRef('pk'), is_read=False)
+            .order_by().values('user').annotate(n=Count('id')).values('n')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    CustomUser.objects.update(
+        unread_notifications=unread(Notification),
+        unread_owner_notifications=unread(OwnerNotification),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_customuser_unread_messages'),
+        ('student', '0002_notification'),
+        ('hostel_owner', '0025_chatmessage_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='unread_owner_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
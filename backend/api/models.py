@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 class CustomUser(AbstractUser):
@@ -33,3 +34,44 @@ class CustomUser(AbstractUser):
     
 
     unread_messages = models.IntegerField(default=0)  # ✅ Track unread messages
+    # Maintained by hostel_owner.unread
+    unread_notifications = models.PositiveIntegerField(default=0)
+    unread_owner_notifications = models.PositiveIntegerField(default=0)
+
+
+class OutgoingEmail(models.Model):
+    """  Email waiting in the outbox; written by api.email_outbox.queue_email, sent by send_queued_emails  """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending email is due; while sending, when the worker's lease on it runs out
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue: pending rows and leased ones, in due order
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status__in=['pending', 'sending']), name='outgoingemail_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
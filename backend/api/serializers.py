@@ -1,10 +1,9 @@
 from rest_framework import serializers
 from .models import CustomUser
 from django.contrib.auth.hashers import make_password
-from django.core.mail import send_mail
+from .email_outbox import queue_email
 import random
 from datetime import timedelta
-from django.core.mail import send_mail
 
 
 from django.utils import timezone  # Import timezone for setting OTP creation time
@@ -40,7 +39,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         from_email = 'no-reply@yourdomain.com'
         recipient_list = [user.email]
 
-        send_mail(subject, message, from_email, recipient_list, fail_silently=False)
+        queue_email(subject, message, recipient_list, from_email)
 
         return user
 
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .email_outbox import queue_email, send_batch
+from .models import OutgoingEmail
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class EmailOutboxTests(TestCase):
+    def test_queue_does_not_send(self):
+        queue_email("Subject", "Body", ["student@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.PENDING)
+
+    def test_batch_uses_one_connection(self):
+        for i in range(3):
+            queue_email(f"Subject {i}", "Body", [f"student{i}@example.com"])
+        with mock.patch("api.email_outbox.get_connection", wraps=mail.get_connection) as get_connection:
+            self.assertEqual(send_batch(), 3)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists())
+        self.assertEqual(send_batch(), 0)
+
+    def test_failure_backs_off_then_dead_letters(self):
+        email = queue_email("Subject", "Body", ["student@example.com"])
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("connection reset")):
+            send_batch()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutgoingEmail.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(send_batch(), 0)  # not due yet
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            send_batch()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.DEAD)
+        self.assertEqual(email.last_error, "connection reset")
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class EmailOutboxLeaseTests(TransactionTestCase):
+    def test_sends_outside_the_claim_transaction(self):
+        queue_email("Subject", "Body", ["student@example.com"])
+        seen = []
+
+        def send(message):
+            seen.append((connection.in_atomic_block, OutgoingEmail.objects.get().status))
+            return 1
+
+        with mock.patch("django.core.mail.EmailMessage.send", autospec=True, side_effect=send):
+            self.assertEqual(send_batch(), 1)
+        self.assertEqual(seen, [(False, OutgoingEmail.SENDING)])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_expired_lease_is_claimed_again(self):
+        email = queue_email("Subject", "Body", ["student@example.com"])
+        OutgoingEmail.objects.update(
+            status=OutgoingEmail.SENDING, attempts=1, next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.assertEqual(send_batch(), 0)  # another worker still holds it
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_batch(), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.SENT, 2))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_expired_last_attempt_is_dead(self):
+        email = queue_email("Subject", "Body", ["student@example.com"])
+        OutgoingEmail.objects.update(status=OutgoingEmail.SENDING, attempts=2, next_attempt_at=timezone.now())
+        with self.assertLogs("api.email_outbox", "ERROR"):
+            self.assertEqual(send_batch(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.DEAD)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_lost_lease_does_not_overwrite(self):
+        email = queue_email("Subject", "Body", ["student@example.com"])
+
+        def send(message):
+            # The lease ran out mid-send and another worker claimed the email
+            OutgoingEmail.objects.update(attempts=F("attempts") + 1)
+            return 1
+
+        with mock.patch("django.core.mail.EmailMessage.send", autospec=True, side_effect=send):
+            send_batch()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.SENDING, 2))
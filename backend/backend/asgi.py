@@ -9,12 +9,14 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import re_path  # change this
 
-from hostel_owner.consumers import ChatConsumer  # ✅ Fixed Import Path
+from hostel_owner.consumers import ChatConsumer, NotificationConsumer  # ✅ Fixed Import Path
+from hostel_owner.ws_auth import JWTAuthMiddleware
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-   "websocket": URLRouter([
+   "websocket": JWTAuthMiddleware(URLRouter([
     re_path(r"ws/chat/(?P<hostel_id>\d+)/$", ChatConsumer.as_asgi()),  # ✅ Regex-based routing
-]),
+    re_path(r"ws/notifications/$", NotificationConsumer.as_asgi()),
+])),
 
 })
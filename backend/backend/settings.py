@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -54,11 +55,28 @@ KHALTI_PUBLIC_KEY = config('KHALTI_PUBLIC_KEY')
 ASGI_APPLICATION = "backend.asgi.application"
 
 # Configure Channels with Redis
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",  # Use Redis in production
-    },
-}
+# The in-memory layer keeps chat fan-out inside one process, which is fine for
+# a single worker, development and tests. With several ASGI workers set
+# CHANNEL_LAYER_BACKEND=postgres to fan out through Postgres LISTEN/NOTIFY
+# (hostel_owner/channel_layers.py, needs psycopg 3: pip install "psycopg[binary]").
+CHANNEL_LAYER_BACKEND = os.getenv('CHANNEL_LAYER_BACKEND', 'memory')
+if CHANNEL_LAYER_BACKEND != 'postgres':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "hostel_owner.channel_layers.PostgresChannelLayer",
+            "CONFIG": {
+                "database": "default",
+                "group_expiry": 86400,
+                "capacity": 100,
+            },
+        },
+    }
 
 
 
@@ -147,6 +165,28 @@ REST_FRAMEWORK = {
     ),
 }
 
+#  Caches. Local memory evicts least-recently-used entries once MAX_ENTRIES is reached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sajilofinder',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+#  Set REDIS_URL to share cached responses between workers
+if os.getenv('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+#  Public hostel list/detail response cache (hostel_owner.cache)
+HOSTEL_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+HOSTEL_CACHE_TIMEOUT = 60 * 15
+
+#  Page size for the public hostel listings (KeysetPagination), clients may pass ?page_size= up to 100
+HOSTEL_LIST_PAGE_SIZE = 20
+
 #  JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -164,7 +204,9 @@ from dotenv import load_dotenv
 
 load_dotenv()  # ✅ Load environment variables from .env file
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Used by the send_queued_emails worker; 'django.core.mail.backends.filebased.EmailBackend' or
+# '...locmem.EmailBackend' for local runs
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -175,6 +217,57 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', 'jfyfbcpxtmtrxrnx')  # 
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER  # ✅ Set default sender email
 
+# Email outbox (api/email_outbox.py): requests queue, send_queued_emails sends
+# EMAIL_OUTBOX_BATCH_SIZE per SMTP connection, polls every
+# EMAIL_OUTBOX_POLL_SECONDS, retries with doubling backoff and gives up after
+# EMAIL_OUTBOX_MAX_ATTEMPTS. A worker leases the emails it claims for
+# EMAIL_OUTBOX_LEASE_SECONDS; keep it well above the time one batch takes to send,
+# or a slow batch is claimed and sent again by another worker.
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', 2))
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = 6 * 60 * 60
+EMAIL_OUTBOX_LEASE_SECONDS = 10 * 60
+
+# Chat messages to the same receiver within this window go out as one email
+CHAT_EMAIL_DIGEST_SECONDS = int(os.getenv('CHAT_EMAIL_DIGEST_SECONDS', 300))
+
+# Write-behind chat persistence (see hostel_owner/chat_buffer.py): broadcast at
+# once, save in batches of up to CHAT_WRITE_BATCH_SIZE or after
+# CHAT_WRITE_FLUSH_SECONDS. Trades durability for fewer writes: a process killed
+# without a clean shutdown loses the messages not yet flushed (about
+# CHAT_WRITE_FLUSH_SECONDS worth, more while the database is failing), although
+# they were already delivered. Off by default.
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+CHAT_WRITE_BATCH_SIZE = int(os.getenv('CHAT_WRITE_BATCH_SIZE', 100))
+CHAT_WRITE_FLUSH_SECONDS = float(os.getenv('CHAT_WRITE_FLUSH_SECONDS', 0.2))
+
+# Chat presence (hostel_owner/presence.py): shared counters live in this cache,
+# refreshed every heartbeat and expiring after the TTL without one.
+PRESENCE_CACHE_ALIAS = HOSTEL_CACHE_ALIAS
+PRESENCE_TTL_SECONDS = 60
+PRESENCE_HEARTBEAT_SECONDS = 20
+
+# Chat flood protection (hostel_owner/chat_limits.py): inbound frames per second
+# and burst size, per socket and per user; largest accepted frame; outbound
+# queue length per socket and what to do when it is full ('drop' or 'disconnect').
+CHAT_CONNECTION_RATE = 5
+CHAT_CONNECTION_BURST = 10
+CHAT_USER_RATE = 10
+CHAT_USER_BURST = 20
+CHAT_MAX_FRAME_BYTES = 4096
+CHAT_OUTBOX_SIZE = 100
+CHAT_SLOW_CONSUMER_POLICY = os.getenv('CHAT_SLOW_CONSUMER_POLICY', 'drop')
+
+# Monthly partitions for notifications and chat (hostel_owner/partitions.py):
+# maintain_partitions (run it daily) creates PARTITION_MONTHS_AHEAD months in
+# advance and removes read notifications older than NOTIFICATION_RETENTION_DAYS
+# and chat messages older than CHAT_RETENTION_DAYS (None keeps chat history forever).
+PARTITION_MONTHS_AHEAD = 3
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 180))
+CHAT_RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS')) if os.getenv('CHAT_RETENTION_DAYS') else None
+
 
 #  Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HostelOwnerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hostel_owner'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,102 @@
+"""
+Date-range room availability.
+
+A booking holds its room for the half-open stay ``[check_in, check_out)`` while
+its status is in ``ACTIVE_BOOKING_STATUSES``. The exclusion constraint on
+``Booking`` keeps those stays disjoint per room, and its GiST index on
+``(room, stay)`` is what every query in this module probes, so "is this room
+free" and "which rooms are free" are each a single indexed query.
+
+``Room.is_available`` is kept as the owner's manual switch (room closed for
+repairs and so on); a room is free only if that switch is on *and* no active
+booking overlaps the requested stay.
+"""
+from django.db import IntegrityError, transaction
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import Exists, OuterRef
+from django.utils.dateparse import parse_date
+
+from .models import ACTIVE_BOOKING_STATUSES, Booking, Room, StayRange
+
+EXCLUSION_VIOLATION = '23P01'
+
+
+class RoomUnavailable(Exception):
+    """ The room is switched off or already booked for part of the stay """
+
+
+def parse_stay(check_in, check_out):
+    """ Parse ``YYYY-MM-DD`` strings (or dates) into a valid ``(check_in, check_out)`` pair """
+    try:
+        start = parse_date(str(check_in))
+        end = parse_date(str(check_out))
+    except ValueError:
+        start = end = None
+    if not start or not end:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+    if end <= start:
+        raise ValueError("check_out must be after check_in.")
+    return start, end
+
+
+def overlapping_bookings(check_in, check_out):
+    """ Active bookings whose stay intersects ``[check_in, check_out)`` """
+    return (
+        Booking.objects.filter(status__in=ACTIVE_BOOKING_STATUSES)
+        .alias(stay=StayRange('check_in', 'check_out'))
+        .filter(stay__overlap=DateRange(check_in, check_out))
+    )
+
+
+def free_rooms(check_in, check_out, queryset=None):
+    """ Rooms with no active booking overlapping the stay, as one anti-join query """
+    if queryset is None:
+        queryset = Room.objects.all()
+    busy = overlapping_bookings(check_in, check_out).filter(room=OuterRef('pk'))
+    return queryset.filter(is_available=True).exclude(Exists(busy))
+
+
+def is_room_free(room, check_in, check_out, exclude=None):
+    """ Single index probe: is ``room`` bookable for the whole stay? ``exclude`` is a booking being moved """
+    if not room.is_available:
+        return False
+    busy = overlapping_bookings(check_in, check_out).filter(room=room)
+    if exclude is not None:
+        busy = busy.exclude(pk=exclude.pk)
+    return not busy.exists()
+
+
+def reserve(room, check_in, check_out, create, exclude=None):
+    """
+    Run ``create()`` (which saves the booking) only if the room is free.
+
+    The pre-check gives a clean error in the common case; the exclusion
+    constraint catches the race where two requests pass it at the same time.
+    """
+    if not is_room_free(room, check_in, check_out, exclude=exclude):
+        raise RoomUnavailable("Room is not available for the selected dates")
+    try:
+        with transaction.atomic():
+            return create()
+    except IntegrityError as exc:
+        if getattr(exc.__cause__, 'sqlstate', None) != EXCLUSION_VIOLATION:
+            raise
+        raise RoomUnavailable("Room is not available for the selected dates")
+
+
+def update_booking(serializer):
+    """
+    Save a PUT/PATCH of a booking with the same checks as a new one.
+
+    The stay must be valid and, while the booking stays active, must not
+    overlap another active booking of the room. Raises ``ValueError`` or
+    ``RoomUnavailable``.
+    """
+    booking = serializer.instance
+    check_in = serializer.validated_data.get('check_in', booking.check_in)
+    check_out = serializer.validated_data.get('check_out', booking.check_out)
+    if check_out <= check_in:
+        raise ValueError("check_out must be after check_in.")
+    if serializer.validated_data.get('status', booking.status) not in ACTIVE_BOOKING_STATUSES:
+        return serializer.save()
+    return reserve(booking.room, check_in, check_out, serializer.save, exclude=booking)
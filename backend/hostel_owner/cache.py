@@ -0,0 +1,107 @@
+"""
+Versioned response cache for the public hostel listing and hostel detail.
+
+Keys embed a global version (bumped by any hostel change) and, for detail
+responses, the hostel's own version, so invalidation is a counter increment
+and stale entries simply age out of the backend. The backend is the cache
+alias named by ``settings.HOSTEL_CACHE_ALIAS``: local memory (LRU) by
+default, or a shared cache when several workers serve traffic.
+
+Hit/miss counters are kept per process; see ``cache_stats``.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+GLOBAL_VERSION_KEY = "hostels:version"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def hostel_cache():
+    return caches[settings.HOSTEL_CACHE_ALIAS]
+
+
+def _hostel_version_key(hostel_id):
+    return f"hostels:{hostel_id}:version"
+
+
+def _versions(*keys):
+    cache = hostel_cache()
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, 1, timeout=None)
+            found[key] = cache.get(key, 1)
+    return [found[key] for key in keys]
+
+
+def _bump(key):
+    cache = hostel_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never set (or evicted): any fresh value differs from what old keys embed.
+        cache.set(key, 2, timeout=None)
+
+
+def invalidate_hostel(hostel_id):
+    """ Drop every cached response that includes this hostel """
+    if hostel_id is not None:
+        _bump(_hostel_version_key(hostel_id))
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def _url_digest(request):
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def list_cache_key(request):
+    (version,) = _versions(GLOBAL_VERSION_KEY)
+    return f"hostels:list:{version}:{_url_digest(request)}"
+
+
+def detail_cache_key(request, hostel_id):
+    (version,) = _versions(_hostel_version_key(hostel_id))
+    return f"hostels:detail:{hostel_id}:{version}:{_url_digest(request)}"
+
+
+def cached_response(key, build):
+    """ Serve ``key`` from the cache, or call ``build()`` and cache its 200 response data """
+    cache = hostel_cache()
+    data = cache.get(key)
+    if data is not None:
+        _record("hits")
+        response = Response(data)
+        response["X-Cache"] = "HIT"
+        return response
+
+    _record("misses")
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.HOSTEL_CACHE_TIMEOUT)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    """ Hit/miss counters of this process since start-up """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "backend": settings.HOSTEL_CACHE_ALIAS,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,303 @@
+"""
+Channels layer on PostgreSQL LISTEN/NOTIFY, for running several ASGI workers.
+
+Every process LISTENs on its own notification channel and names the channels
+it creates after it (``specific.<process>!<id>``), so ``send`` is a single
+NOTIFY to the owning process. Group membership lives in a table with an
+expiry per entry; ``group_send`` looks up the members and notifies each
+process that owns one of them, in one more statement. A process with many
+members gets several NOTIFYs, each listing as many of its channels as fit
+under the NOTIFY size limit; message bodies too big to fit are stored in an
+overflow table and sent by reference.
+
+Like the other channel layers delivery is at-most-once: messages for a
+process whose listener is reconnecting, or for a full channel, are dropped.
+
+Only process-specific channels (those from ``new_channel``) are supported;
+that is all ``AsyncConsumer`` and group messaging need.
+"""
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_TABLE = "hostel_owner_channelgroupmembership"
+OVERFLOW_TABLE = "hostel_owner_channellayermessage"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_BYTES = 7900
+OVERFLOW_RETENTION_SECONDS = 300
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    raise TypeError(f"Cannot send {type(value).__name__} over the channel layer")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    extensions = ["groups", "flush"]
+
+    def __init__(self, database="default", prefix="chl", expiry=60, group_expiry=86400,
+                 capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.database = database
+        self.group_expiry = group_expiry
+        self.process_name = uuid.uuid4().hex[:12]
+        self.notify_prefix = f"{prefix}_"
+        self.notify_channel = f"{self.notify_prefix}{self.process_name}"
+
+        self.queues = {}
+        self._loop = None
+        self._listener = None
+        self._listening = None
+        self._conn = None
+        self._conn_lock = None
+        self._cleaned_at = 0.0
+
+    # Connections
+
+    @property
+    def conninfo(self):
+        db = settings.DATABASES[self.database]
+        return make_conninfo(
+            dbname=db["NAME"], user=db.get("USER") or None, password=db.get("PASSWORD") or None,
+            host=db.get("HOST") or None, port=db.get("PORT") or None,
+            client_encoding="utf8",
+        )
+
+    def _on_main_loop(self):
+        return self._loop is not None and asyncio.get_running_loop() is self._loop
+
+    @asynccontextmanager
+    async def _connection(self):
+        """
+        The shared connection on the listening loop; callers on any other loop
+        (``async_to_sync`` from sync code) get a short-lived one.
+        """
+        if not self._on_main_loop():
+            async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                yield conn
+            return
+        async with self._conn_lock:
+            if self._conn is None or self._conn.closed:
+                self._conn = await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True)
+            yield self._conn
+
+    async def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._conn_lock = asyncio.Lock()
+            self._listening = asyncio.Event()
+        if loop is self._loop and (self._listener is None or self._listener.done()):
+            self._listener = loop.create_task(self._listen())
+        await self._listening.wait()
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.notify_channel)))
+                    self._listening.set()
+                    async for notify in conn.notifies():
+                        await self._dispatch(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except psycopg.Error as e:
+                self._listening.clear()
+                logger.warning("Channel layer listener lost its connection (%s), reconnecting", e)
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, payload):
+        envelope = json.loads(payload, object_hook=_decode)
+        message = envelope.get("m")
+        if "ref" in envelope:
+            async with self._connection() as conn:
+                cur = await conn.execute(
+                    sql.SQL("SELECT payload FROM {} WHERE id = %s").format(sql.Identifier(OVERFLOW_TABLE)),
+                    (envelope["ref"],),
+                )
+                row = await cur.fetchone()
+            if row is None:
+                return
+            message = json.loads(row[0], object_hook=_decode)
+
+        deadline = time.monotonic() + self.expiry
+        for channel in envelope["c"]:
+            queue = self.queues.get(channel)
+            if queue is None:
+                continue
+            try:
+                queue.put_nowait((deadline, message))
+            except asyncio.QueueFull:
+                logger.warning("Channel %s is full, dropping message", channel)
+
+    # Channel layer API
+
+    def _process_of(self, channel):
+        if "!" not in channel or "." not in channel:
+            raise ValueError(f"{channel!r} is not a process-specific channel")
+        return channel.split(".", 1)[1].split("!", 1)[0]
+
+    def _payload(self, channels, message):
+        return json.dumps({"c": channels, "m": message}, default=_encode, separators=(",", ":"))
+
+    async def _overflow(self, conn, message):
+        cur = await conn.execute(
+            sql.SQL("INSERT INTO {} (payload, created_at) VALUES (%s, now()) RETURNING id").format(
+                sql.Identifier(OVERFLOW_TABLE)),
+            (json.dumps(message, default=_encode),),
+        )
+        return (await cur.fetchone())[0]
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+
+        target = self.notify_prefix + self._process_of(channel)
+        payload = self._payload([channel], message)
+        async with self._connection() as conn:
+            if len(payload.encode()) > MAX_NOTIFY_BYTES:
+                payload = json.dumps({"c": [channel], "ref": await self._overflow(conn, message)})
+            await conn.execute("SELECT pg_notify(%s, %s)", (target, payload))
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        await self._ensure_listener()
+        queue = self.queues.setdefault(channel, asyncio.Queue(maxsize=self.get_capacity(channel)))
+        try:
+            while True:
+                deadline, message = await queue.get()
+                if deadline >= time.monotonic():
+                    return message
+        except asyncio.CancelledError:
+            # The consumer went away; forget the channel unless messages are waiting.
+            if queue.empty():
+                self.queues.pop(channel, None)
+            raise
+
+    async def new_channel(self, prefix="specific"):
+        await self._ensure_listener()
+        channel = f"{prefix}.{self.process_name}!{uuid.uuid4().hex}"
+        self.queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        return channel
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        self._process_of(channel)
+        async with self._connection() as conn:
+            await conn.execute(
+                sql.SQL(
+                    "INSERT INTO {} (group_name, channel, expires_at) "
+                    "VALUES (%s, %s, now() + make_interval(secs => %s)) "
+                    "ON CONFLICT (group_name, channel) DO UPDATE SET expires_at = EXCLUDED.expires_at"
+                ).format(sql.Identifier(MEMBERSHIP_TABLE)),
+                (group, channel, self.group_expiry),
+            )
+            await self._clean_expired(conn)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        async with self._connection() as conn:
+            await conn.execute(
+                sql.SQL("DELETE FROM {} WHERE group_name = %s AND channel = %s").format(sql.Identifier(MEMBERSHIP_TABLE)),
+                (group, channel),
+            )
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_group_name(group), "Group name not valid"
+
+        body = json.dumps(message, default=_encode, separators=(",", ":"))
+        async with self._connection() as conn:
+            cur = await conn.execute(
+                sql.SQL("SELECT channel FROM {} WHERE group_name = %s AND expires_at > now()").format(
+                    sql.Identifier(MEMBERSHIP_TABLE)),
+                (group,),
+            )
+            members = {}
+            for (channel,) in await cur.fetchall():
+                members.setdefault(self._process_of(channel), []).append(channel)
+            if not members:
+                return
+
+            # Keep room for at least one channel name next to the body, otherwise send it by reference
+            longest = max((channel for channels in members.values() for channel in channels), key=len)
+            if len(self._envelope([longest], "m", body).encode()) > MAX_NOTIFY_BYTES:
+                body_key, body = "ref", json.dumps(await self._overflow(conn, message))
+            else:
+                body_key = "m"
+
+            targets, payloads = [], []
+            for process, channels in members.items():
+                for payload in self._envelopes(channels, body_key, body):
+                    targets.append(self.notify_prefix + process)
+                    payloads.append(payload)
+            # All the NOTIFYs in one statement
+            await conn.execute(
+                "SELECT pg_notify(target, payload) FROM unnest(%s::text[], %s::text[]) AS n(target, payload)",
+                (targets, payloads),
+            )
+
+    def _envelope(self, channels, body_key, body):
+        return '{"c":' + json.dumps(channels, separators=(",", ":")) + ',"' + body_key + '":' + body + "}"
+
+    def _envelopes(self, channels, body_key, body):
+        """ NOTIFY payloads for one process, splitting the channel list so each stays under MAX_NOTIFY_BYTES """
+        size = len(self._envelope([], body_key, body).encode())
+        chunk, used = [], size
+        for channel in channels:
+            extra = len(json.dumps(channel).encode()) + 1
+            if chunk and used + extra > MAX_NOTIFY_BYTES:
+                yield self._envelope(chunk, body_key, body)
+                chunk, used = [], size
+            chunk.append(channel)
+            used += extra
+        if chunk:
+            yield self._envelope(chunk, body_key, body)
+
+    async def flush(self):
+        self.queues.clear()
+        async with self._connection() as conn:
+            await conn.execute(sql.SQL("DELETE FROM {}").format(sql.Identifier(MEMBERSHIP_TABLE)))
+            await conn.execute(sql.SQL("DELETE FROM {}").format(sql.Identifier(OVERFLOW_TABLE)))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _clean_expired(self, conn):
+        """ Drop expired memberships and old overflow payloads, at most once a minute per process """
+        if time.monotonic() - self._cleaned_at < 60:
+            return
+        self._cleaned_at = time.monotonic()
+        await conn.execute(sql.SQL("DELETE FROM {} WHERE expires_at < now()").format(sql.Identifier(MEMBERSHIP_TABLE)))
+        await conn.execute(
+            sql.SQL("DELETE FROM {} WHERE created_at < now() - make_interval(secs => %s)").format(
+                sql.Identifier(OVERFLOW_TABLE)),
+            (OVERFLOW_RETENTION_SECONDS,),
+        )
@@ -0,0 +1,79 @@
+"""
+Queries over chat messages, one conversation at a time.
+
+A conversation is the pair of users chatting about a hostel. Messages are
+read one direction at a time through the (hostel, sender, receiver, id)
+index and merged, so a page costs two short index range scans regardless of
+how long the conversation or the hostel's whole chat has grown.
+
+``Conversation`` rows (kept by a trigger, see the model) back the inbox.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from api.models import CustomUser
+from .models import ChatMessage, Conversation
+
+MESSAGE_FIELDS = ("id", "uid", "sender_id", "receiver_id", "message", "timestamp")
+
+
+def conversation_messages(hostel_id, user_id, counterpart_id, before=None, after=None, limit=50):
+    """
+    Up to ``limit`` messages between the two users about the hostel, oldest first.
+
+    With ``after`` the page holds the first messages with a larger id, otherwise
+    the latest ones (with an id below ``before`` when given). Rows are dicts of
+    ``MESSAGE_FIELDS``.
+    """
+    ordering = "id" if after is not None else "-id"
+
+    def direction(sender_id, receiver_id):
+        messages = ChatMessage.objects.filter(hostel_id=hostel_id, sender_id=sender_id, receiver_id=receiver_id)
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        if after is not None:
+            messages = messages.filter(id__gt=after)
+        return messages.order_by(ordering).values(*MESSAGE_FIELDS)[:limit]
+
+    page = direction(user_id, counterpart_id).union(direction(counterpart_id, user_id), all=True)
+    rows = list(page.order_by(ordering)[:limit])
+    if ordering == "-id":
+        rows.reverse()
+    return rows
+
+
+def inbox(user):
+    """ The user's conversations, latest first, with hostel and counterpart loaded in the same query """
+    conversations = Conversation.objects.select_related("hostel", "owner", "student").only(
+        "id", "hostel", "owner", "student", "last_message_id", "last_message", "last_sender",
+        "last_message_at", "owner_unread", "student_unread",
+        "hostel__name", "owner__username", "student__username",
+    )
+    return conversations.filter(Q(owner=user) | Q(student=user)).order_by(F("last_message_at").desc(nulls_last=True), "-id")
+
+
+def mark_conversation_read(conversation_id, user):
+    """
+    Reset the user's unread count on a conversation, taking it off their
+    ``unread_messages`` total too. Returns the conversation, or None if the
+    user is not part of it.
+    """
+    with transaction.atomic():
+        # Lock order (conversation, then user) matches the insert trigger.
+        conversation = (
+            Conversation.objects.select_for_update()
+            .filter(Q(owner=user) | Q(student=user), id=conversation_id)
+            .first()
+        )
+        if conversation is None:
+            return None
+        field = "owner_unread" if conversation.owner_id == user.id else "student_unread"
+        cleared = getattr(conversation, field)
+        if cleared:
+            setattr(conversation, field, 0)
+            conversation.save(update_fields=[field])
+            CustomUser.objects.filter(id=user.id).update(
+                unread_messages=Greatest(F("unread_messages") - cleared, 0)
+            )
+    return conversation
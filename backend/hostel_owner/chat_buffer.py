@@ -0,0 +1,104 @@
+"""
+Write-behind persistence for chat messages (``settings.CHAT_WRITE_BEHIND``).
+
+With it on, ``ChatConsumer`` broadcasts a message straight away and hands
+the unsaved ``ChatMessage`` to the process-wide buffer. The buffer writes
+with ``bulk_create`` once ``CHAT_WRITE_BATCH_SIZE`` messages are waiting or
+``CHAT_WRITE_FLUSH_SECONDS`` after the first one arrived, whichever comes
+first: one thread hop and one transaction per batch instead of per message.
+
+Messages are written in the order they arrived. Only one flush runs at a time,
+so ids follow arrival order within the process. A failed batch goes back to
+the front of the queue and is retried. Consumers flush on disconnect, and
+whatever is still queued at interpreter exit is written by an ``atexit`` hook.
+
+The timestamp and ``uid`` are set on arrival, so they are exact; the id is
+only known after the flush, so write-behind broadcasts carry ``"id": None``
+and clients match them to saved messages by ``uid``.
+
+Messages are broadcast before they are saved. If the process dies without
+running the ``atexit`` hook (SIGKILL, OOM kill, crash), messages in the buffer
+are lost even though their recipients already saw them. That is up to
+``CHAT_WRITE_FLUSH_SECONDS`` worth normally, and everything since the
+database became unavailable while batches keep failing.
+"""
+import asyncio
+import atexit
+import logging
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ChatWriteBuffer:
+    def __init__(self, batch_size=100, flush_seconds=0.2):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pending = deque()
+        self._timer = None
+        self._flush_lock = None
+        self.written = 0
+
+    def add(self, message):
+        """ Queue an unsaved ChatMessage; must be called on the event loop """
+        self.pending.append(message)
+        if len(self.pending) >= self.batch_size:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.flush_seconds)
+
+    def _schedule(self, delay):
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """ Write everything queued so far, batch by batch, in order """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self.pending:
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                try:
+                    await sync_to_async(self._write)(batch)
+                except Exception:
+                    logger.exception("Writing %d chat messages failed; retrying", len(batch))
+                    self.pending.extendleft(reversed(batch))
+                    self._schedule(max(self.flush_seconds, 1.0))
+                    return
+
+    def _write(self, batch):
+        ChatMessage.objects.bulk_create(batch)
+        self.written += len(batch)
+
+    def drain(self):
+        """ Synchronously write whatever is left, e.g. at shutdown """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = list(self.pending)
+        self.pending.clear()
+        if batch:
+            logger.info("Writing %d buffered chat messages at shutdown", len(batch))
+            self._write(batch)
+
+
+_buffer = None
+
+
+def chat_write_buffer():
+    """ The process-wide buffer, created on first use """
+    global _buffer
+    if _buffer is None:
+        _buffer = ChatWriteBuffer(settings.CHAT_WRITE_BATCH_SIZE, settings.CHAT_WRITE_FLUSH_SECONDS)
+        atexit.register(_buffer.drain)
+    return _buffer
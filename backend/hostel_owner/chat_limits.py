@@ -0,0 +1,109 @@
+"""
+Flood protection for ChatConsumer.
+
+Inbound frames pass two token buckets: one per connection and one per user,
+shared by all of that user's sockets in this process. Frames over
+``CHAT_MAX_FRAME_BYTES`` are rejected before they are parsed.
+
+Outbound fan-out (chat messages, presence) goes through a bounded per-socket
+``Outbox``, drained by a writer task. When a client reads too slowly to keep
+up, ``CHAT_SLOW_CONSUMER_POLICY`` decides what happens: ``"drop"`` discards
+new frames, ``"disconnect"`` closes the socket.
+
+Throttled, oversized and dropped frames are counted per process, see
+``chat_stats``.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_user_buckets = {}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self, cost=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+def connection_bucket():
+    return TokenBucket(settings.CHAT_CONNECTION_RATE, settings.CHAT_CONNECTION_BURST)
+
+
+def user_bucket(user_id):
+    """ The user's shared bucket; pair every call with ``release_user_bucket`` """
+    bucket, sockets = _user_buckets.get(user_id, (None, 0))
+    if bucket is None:
+        bucket = TokenBucket(settings.CHAT_USER_RATE, settings.CHAT_USER_BURST)
+    _user_buckets[user_id] = (bucket, sockets + 1)
+    return bucket
+
+
+def release_user_bucket(user_id):
+    bucket, sockets = _user_buckets.get(user_id, (None, 0))
+    if sockets <= 1:
+        _user_buckets.pop(user_id, None)
+    else:
+        _user_buckets[user_id] = (bucket, sockets - 1)
+
+
+class Outbox:
+    """ Bounded queue of outgoing text frames for one socket """
+
+    def __init__(self, send, close, size=None, policy=None):
+        self.queue = asyncio.Queue(maxsize=size or settings.CHAT_OUTBOX_SIZE)
+        self.policy = policy or settings.CHAT_SLOW_CONSUMER_POLICY
+        self._send = send
+        self._close = close
+        self._writer = asyncio.get_running_loop().create_task(self._drain())
+
+    async def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            record("dropped")
+            if self.policy == "disconnect":
+                record("disconnected_slow")
+                self.stop()
+                await self._close()
+
+    async def _drain(self):
+        while True:
+            await self._send(await self.queue.get())
+
+    def stop(self):
+        self._writer.cancel()
+
+
+def record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def chat_stats():
+    """ Flood-protection counters of this process since start-up """
+    with _stats_lock:
+        counts = dict(_stats)
+    return {
+        "throttled_connection": counts.get("throttled_connection", 0),
+        "throttled_user": counts.get("throttled_user", 0),
+        "oversized": counts.get("oversized", 0),
+        "dropped": counts.get("dropped", 0),
+        "disconnected_slow": counts.get("disconnected_slow", 0),
+    }
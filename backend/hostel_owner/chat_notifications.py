@@ -0,0 +1,95 @@
+"""
+Email notifications for chat messages, kept off the WebSocket event loop.
+
+``queue_chat_email`` is called from ``ChatConsumer`` and only records the
+message. The first message for a receiver starts a timer of
+``settings.CHAT_EMAIL_DIGEST_SECONDS``; when it fires, everything queued for
+that receiver goes out as one digest email, queued in the email outbox
+(``api.email_outbox``) from a worker thread so the database write never blocks
+the loop. Receivers who are online (see ``presence``) are
+skipped, since they saw the messages live: queueing checks this process's
+sockets, and the digest checks every worker before sending.
+
+The queue is per process: pending digests are lost if the worker stops.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from api.email_outbox import queue_email
+
+from . import presence
+
+logger = logging.getLogger(__name__)
+
+# Messages quoted in a digest; the rest are only counted.
+DIGEST_MAX_MESSAGES = 10
+
+_pending = defaultdict(list)
+_timers = {}
+
+
+def queue_chat_email(sender, receiver, message):
+    """ Add a chat message to the receiver's next digest; must run on the event loop """
+    if presence.is_connected_here(receiver.id):
+        return
+    _pending[receiver.id].append((receiver.email, receiver.username, sender.username, message))
+    if receiver.id not in _timers:
+        loop = asyncio.get_running_loop()
+        _timers[receiver.id] = loop.call_later(
+            settings.CHAT_EMAIL_DIGEST_SECONDS, lambda: loop.create_task(_flush(receiver.id))
+        )
+
+
+async def _flush(receiver_id):
+    _timers.pop(receiver_id, None)
+    entries = _pending.pop(receiver_id, [])
+    if not entries or presence.is_connected_here(receiver_id):
+        return
+    await sync_to_async(send_chat_digest, thread_sensitive=False)(receiver_id, entries)
+
+
+def send_chat_digest(receiver_id, entries):
+    """ Send one email covering ``entries``, a list of (email, username, sender, message) """
+    if presence.is_online(receiver_id):
+        return
+    recipient_email, username = entries[0][0], entries[0][1]
+    if len(entries) == 1:
+        send_chat_email_notification_to(recipient_email, username, entries[0][2], entries[0][3])
+        return
+
+    senders = sorted({sender for _, _, sender, _ in entries})
+    lines = [f'{sender}: "{message}"' for _, _, sender, message in entries[:DIGEST_MAX_MESSAGES]]
+    if len(entries) > DIGEST_MAX_MESSAGES:
+        lines.append(f"...and {len(entries) - DIGEST_MAX_MESSAGES} more.")
+    subject = f"{len(entries)} new messages from {', '.join(senders)}"
+    message_body = f"Hello {username},\n\n" \
+                   f"You have {len(entries)} new messages on SajiloFinder:\n\n" \
+                   + "\n".join(lines) + "\n\n" \
+                   f"Log in to SajiloFinder to continue the conversation.\n\n" \
+                   f"Thank you!"
+    try:
+        queue_email(subject, message_body, [recipient_email])
+        logger.info(f" Chat digest of {len(entries)} messages queued for {recipient_email}")
+    except Exception as e:
+        logger.error(f" Error queueing chat digest to {recipient_email}: {str(e)}")
+
+
+def send_chat_email_notification_to(recipient_email, username, sender_username, message):
+    try:
+        logger.info(f" Sending chat notification email to {recipient_email}")
+        subject = f"New Message from {sender_username}"
+        message_body = f"Hello {username},\n\n" \
+                       f"You have received a new message from {sender_username}:\n\n" \
+                       f'"{message}"\n\n' \
+                       f"Log in to SajiloFinder to continue the conversation.\n\n" \
+                       f"Thank you!"
+
+        queue_email(subject, message_body, [recipient_email])
+
+        logger.info(f" Chat notification email queued for {recipient_email}")
+    except Exception as e:
+        logger.error(f" Error queueing chat notification email to {recipient_email}: {str(e)}")
+
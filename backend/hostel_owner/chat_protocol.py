@@ -0,0 +1,110 @@
+"""
+Wire formats for the chat socket, negotiated through WebSocket subprotocols.
+
+``chat.json.v1`` (also what clients asking for no subprotocol get) is the
+original JSON text protocol. ``chat.msgpack.v1`` uses binary MessagePack
+frames with short keys, numeric ids and epoch-millisecond timestamps instead
+of usernames and formatted dates:
+
+    message   {"t": "m", "i": id, "k": uid, "s": sender_id, "r": receiver_id, "b": text, "ts": epoch_ms}
+    presence  {"t": "p", "u": user_id, "o": online}
+    pong      {"t": "pong"}
+    error     {"t": "e", "e": text}
+
+Inbound frames are the same maps in either protocol (``{"message": ...,
+"receiver_id": ...}``, ``{"type": "ping"}`` ...), only the encoding differs.
+MessagePack is offered only when the ``msgpack`` package is installed.
+
+Compression is up to the server: uvicorn with the websockets implementation
+negotiates permessage-deflate by default, and it applies to both protocols.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_PROTOCOL = "chat.json.v1"
+MSGPACK_PROTOCOL = "chat.msgpack.v1"
+
+
+class JsonCodec:
+    subprotocol = JSON_PROTOCOL
+
+    def decode(self, text_data, bytes_data):
+        if text_data is None:
+            raise ValueError("Binary frames are not supported.")
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON format.")
+        if not isinstance(data, dict):
+            raise ValueError("Invalid JSON format.")
+        return data
+
+    def message(self, event):
+        return json.dumps({
+            "id": event["id"],
+            "uid": event["uid"],
+            "sender_id": event["sender_id"],
+            "receiver_id": event["receiver_id"],
+            "sender": event["sender"],
+            "receiver": event["receiver"],
+            "message": event["message"],
+            "timestamp": event["timestamp"],
+        })
+
+    def presence(self, user_id, online):
+        return json.dumps({"type": "presence", "user_id": user_id, "online": online})
+
+    def pong(self):
+        return json.dumps({"type": "pong"})
+
+    def error(self, text):
+        return json.dumps({"error": text})
+
+
+class MsgpackCodec:
+    subprotocol = MSGPACK_PROTOCOL
+
+    def decode(self, text_data, bytes_data):
+        if bytes_data is None:
+            raise ValueError("Text frames are not supported on this protocol.")
+        try:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        except Exception:
+            raise ValueError("Invalid MessagePack frame.")
+        if not isinstance(data, dict):
+            raise ValueError("Invalid MessagePack frame.")
+        return data
+
+    def message(self, event):
+        return msgpack.packb({
+            "t": "m",
+            "i": event["id"],
+            "k": event["uid"],
+            "s": event["sender_id"],
+            "r": event["receiver_id"],
+            "b": event["message"],
+            "ts": event["ts"],
+        })
+
+    def presence(self, user_id, online):
+        return msgpack.packb({"t": "p", "u": user_id, "o": online})
+
+    def pong(self):
+        return msgpack.packb({"t": "pong"})
+
+    def error(self, text):
+        return msgpack.packb({"t": "e", "e": text})
+
+
+def negotiate(subprotocols):
+    """ The codec for the client's offered subprotocols, in the client's order of preference """
+    for protocol in subprotocols or ():
+        if protocol == MSGPACK_PROTOCOL and msgpack is not None:
+            return MsgpackCodec()
+        if protocol == JSON_PROTOCOL:
+            return JsonCodec()
+    return JsonCodec()
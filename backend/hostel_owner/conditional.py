@@ -0,0 +1,55 @@
+"""
+ETag / Last-Modified validators for hostel and room detail responses.
+
+Both are read from ``Hostel.version``/``Hostel.updated_at`` with a single
+primary-key lookup, so a revalidating client gets its 304 before any object
+graph is loaded or serialized. Room changes bump their hostel's version, so a
+room's validators are its hostel's.
+"""
+from django.views.decorators.http import condition
+
+from .models import Hostel, Room
+
+
+def _memoized(request, attr, lookup):
+    if not hasattr(request, attr):
+        setattr(request, attr, lookup())
+    return getattr(request, attr)
+
+
+def _hostel_validators(request, pk):
+    return _memoized(
+        request, "_hostel_validators",
+        lambda: Hostel.objects.filter(pk=pk).values_list("version", "updated_at").first(),
+    )
+
+
+def _room_validators(request, pk):
+    return _memoized(
+        request, "_room_validators",
+        lambda: Room.objects.filter(pk=pk).values_list("floor__hostel__version", "floor__hostel__updated_at").first(),
+    )
+
+
+def hostel_etag(request, pk=None, **kwargs):
+    row = _hostel_validators(request, pk)
+    return f"hostel-{pk}-v{row[0]}" if row else None
+
+
+def hostel_last_modified(request, pk=None, **kwargs):
+    row = _hostel_validators(request, pk)
+    return row[1] if row else None
+
+
+def room_etag(request, pk=None, **kwargs):
+    row = _room_validators(request, pk)
+    return f"room-{pk}-v{row[0]}" if row else None
+
+
+def room_last_modified(request, pk=None, **kwargs):
+    row = _room_validators(request, pk)
+    return row[1] if row else None
+
+
+hostel_condition = condition(etag_func=hostel_etag, last_modified_func=hostel_last_modified)
+room_condition = condition(etag_func=room_etag, last_modified_func=room_last_modified)
@@ -1,105 +1,305 @@
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from hostel_owner.models import ChatMessage
 from api.models import CustomUser
-from django.core.exceptions import ObjectDoesNotExist
 from hostel_owner.models import Hostel
-from django.db.models import F
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from hostel_owner.chat_buffer import chat_write_buffer
+from hostel_owner.chat_notifications import queue_chat_email
+from hostel_owner import presence
+from hostel_owner.notification_push import backlog, notification_group, notification_model
+from hostel_owner.chat_protocol import negotiate
+from hostel_owner.chat_limits import Outbox, connection_bucket, record, release_user_bucket, user_bucket
+
+# Close codes sent when the handshake is refused
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_HOSTEL_NOT_FOUND = 4404
+# Sent to clients that cannot keep up with their outbound queue
+CLOSE_SLOW_CONSUMER = 4408
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat about one hostel between its owner and students.
+
+    The user comes from the JWT checked by JWTAuthMiddleware; the hostel and
+    every counterpart are loaded once and kept for the life of the socket, so
+    each message costs a single INSERT. Students always write to the hostel
+    owner; the owner names the student with ``receiver_id``.
+
+    With ``settings.CHAT_WRITE_BEHIND`` messages are broadcast first and saved
+    in batches by ``chat_write_buffer()``.
+
+    Besides chat messages the socket understands ``{"type": "ping"}`` (answered
+    with a pong; keeps the user's presence alive) and ``{"type": "presence",
+    "user_id": ...}``. Users coming online or going offline are announced to
+    the hostel's group as ``{"type": "presence", "user_id", "online"}``.
+
+    Inbound frames are rate limited per connection and per user, and
+    oversized ones rejected; fan-out to the socket goes through a bounded
+    outbox (see chat_limits).
+
+    Frames are JSON text by default; clients offering the ``chat.msgpack.v1``
+    subprotocol get binary MessagePack frames instead (see chat_protocol).
+    """
+
     async def connect(self):
-        self.hostel_id = self.scope["url_route"]["kwargs"]["hostel_id"]
+        self.hostel_id = int(self.scope["url_route"]["kwargs"]["hostel_id"])
         self.room_group_name = f"chat_{self.hostel_id}"
+        self.user = self.scope.get("user")
+        self.joined = False
+
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        hostel = await self.get_hostel()
+        if hostel is None:
+            await self.close(code=CLOSE_HOSTEL_NOT_FOUND)
+            return
+        self.owner = hostel.owner
+        self.is_owner = self.user.id == self.owner.id
+        self.counterparts = {} if self.is_owner else {self.owner.id: self.owner}
+        self.bucket = connection_bucket()
+        self.user_bucket = user_bucket(self.user.id)
 
         # Join WebSocket Room
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        await self.accept()
+        self.joined = True
+        came_online = await sync_to_async(presence.connect)(self.user.id)
+        presence.ensure_heartbeat()
+        self.outbox = Outbox(self.write_frame, lambda: self.close(code=CLOSE_SLOW_CONSUMER))
+        self.codec = negotiate(self.scope.get("subprotocols"))
+        offered = self.codec.subprotocol in (self.scope.get("subprotocols") or ())
+        await self.accept(subprotocol=self.codec.subprotocol if offered else None)
+
+        if came_online:
+            await self.announce_presence(True)
+        if not self.is_owner:
+            await self.send_presence(self.owner.id)
 
     async def disconnect(self, close_code):
+        if not self.joined:
+            return
+        self.outbox.stop()
+        release_user_bucket(self.user.id)
         # Leave WebSocket Room
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if await sync_to_async(presence.disconnect)(self.user.id):
+            await self.announce_presence(False)
+        if settings.CHAT_WRITE_BEHIND:
+            await chat_write_buffer().flush()
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """ Handle incoming WebSocket messages """
+        size = len(bytes_data) if text_data is None else len(text_data)
+        if text_data is not None and size <= settings.CHAT_MAX_FRAME_BYTES:
+            size = len(text_data.encode())
+        if size > settings.CHAT_MAX_FRAME_BYTES:
+            record("oversized")
+            await self.send_error(f"Frame larger than {settings.CHAT_MAX_FRAME_BYTES} bytes.")
+            return
+        if not self.bucket.allow():
+            record("throttled_connection")
+            await self.send_error("Rate limit exceeded, slow down.")
+            return
+        if not self.user_bucket.allow():
+            record("throttled_user")
+            await self.send_error("Rate limit exceeded, slow down.")
+            return
+
         try:
-            data = json.loads(text_data)
-            sender_id = data.get("sender_id")
-            receiver_id = data.get("receiver_id")
-            message = data.get("message")
+            data = self.codec.decode(text_data, bytes_data)
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
 
-            if not sender_id or not receiver_id or not message:
-                await self.send_error("Missing sender_id, receiver_id, or message.")
-                return
+        presence.seen(self.user.id)
+        if data.get("type") == "ping":
+            await self.write_frame(self.codec.pong())
+            return
+        if data.get("type") == "presence":
+            await self.send_presence(data.get("user_id"))
+            return
 
-            sender = await self.get_user(sender_id)
-            receiver = await self.get_user(receiver_id)
+        message = data.get("message")
+        if not message:
+            await self.send_error("Missing message.")
+            return
+        sender_id = data.get("sender_id")
+        if sender_id and str(sender_id) != str(self.user.id):
+            await self.send_error("sender_id does not match the authenticated user.")
+            return
 
-            if not sender or not receiver:
-                await self.send_error("Invalid sender or receiver ID.")
-                return
+        receiver = await self.get_counterpart(data.get("receiver_id"))
+        if receiver is None:
+            await self.send_error("Invalid receiver ID.")
+            return
 
-            # Save message in the database
-            chat_message = await self.save_message(sender, receiver, message)
+        # Save message in the database, now or in the next batch
+        if settings.CHAT_WRITE_BEHIND:
+            chat_message = self.build_message(receiver, message)
+            chat_write_buffer().add(chat_message)
+        else:
+            chat_message = await self.save_message(receiver, message)
 
-            # Send email notification
-            send_chat_email_notification(sender, receiver, message)
+        # Queue an email digest for the receiver, sent later off the event loop
+        queue_chat_email(self.user, receiver, message)
 
-            # Send message to WebSocket group
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "chat_message",
-                    "sender": sender.username,
-                    "receiver": receiver.username,
-                    "message": message,
-                    "timestamp": chat_message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-            )
+        # Send message to WebSocket group
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                "type": "chat_message",
+                "id": chat_message.id,
+                "uid": str(chat_message.uid),
+                "sender_id": self.user.id,
+                "receiver_id": receiver.id,
+                "sender": self.user.username,
+                "receiver": receiver.username,
+                "message": message,
+                "timestamp": chat_message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "ts": int(chat_message.timestamp.timestamp() * 1000),
+            }
+        )
 
-        except json.JSONDecodeError:
-            await self.send_error("Invalid JSON format.")
+    async def chat_message(self, event):
+        """ Send message to WebSocket, if this socket's user is part of the conversation """
+        # The group is the whole hostel: students must not see each other's chats with the owner
+        if self.is_owner or self.user.id in (event["sender_id"], event["receiver_id"]):
+            await self.outbox.put(self.codec.message(event))
 
-        except CustomUser.DoesNotExist:
-            await self.send_error("Invalid sender or receiver ID.")
+    async def presence_event(self, event):
+        """ Relay a presence change in this hostel's chat to the WebSocket """
+        if event["user_id"] != self.user.id:
+            await self.outbox.put(self.codec.presence(event["user_id"], event["online"]))
 
-    async def chat_message(self, event):
-        """ Send message to WebSocket """
-        await self.send(text_data=json.dumps({
-            "sender": event["sender"],
-            "receiver": event["receiver"],
-            "message": event["message"],
-            "timestamp": event["timestamp"],
-        }))
+    async def announce_presence(self, online):
+        await self.channel_layer.group_send(
+            self.room_group_name, {"type": "presence_event", "user_id": self.user.id, "online": online}
+        )
 
-    @sync_to_async
-    def get_user(self, user_id):
-        """ Fetch user asynchronously to avoid blocking """
+    async def send_presence(self, user_id):
         try:
-            return CustomUser.objects.get(id=user_id)
-        except CustomUser.DoesNotExist:
-            return None
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            await self.send_error("Invalid user ID.")
+            return
+        online = await sync_to_async(presence.is_online, thread_sensitive=False)(user_id)
+        await self.write_frame(self.codec.presence(user_id, online))
 
-    @sync_to_async
-    def save_message(self, sender, receiver, message):
-        """ Save chat message asynchronously, ensuring hostel_id exists """
+    async def get_counterpart(self, receiver_id):
+        """ The user this socket's messages go to, looked up at most once per socket """
+        if not self.is_owner:
+            if receiver_id and str(receiver_id) != str(self.owner.id):
+                return None
+            return self.owner
         try:
-            hostel = Hostel.objects.get(id=self.hostel_id)
-            return ChatMessage.objects.create(
-                sender=sender,
-                receiver=receiver,
-                hostel=hostel,
-                message=message
-            )
-        except ObjectDoesNotExist:
+            receiver_id = int(receiver_id)
+        except (TypeError, ValueError):
+            return None
+        if receiver_id == self.user.id:
             return None
+        if receiver_id not in self.counterparts:
+            receiver = await self.get_user(receiver_id)
+            if receiver is None:
+                return None
+            self.counterparts[receiver_id] = receiver
+        return self.counterparts[receiver_id]
+
+    @sync_to_async
+    def get_hostel(self):
+        return Hostel.objects.select_related("owner").only(
+            "id", "owner__id", "owner__username", "owner__email"
+        ).filter(id=self.hostel_id).first()
+
+    @sync_to_async
+    def get_user(self, user_id):
+        """ Fetch user asynchronously to avoid blocking """
+        return CustomUser.objects.only("id", "username", "email").filter(id=user_id).first()
+
+    def build_message(self, receiver, message):
+        return ChatMessage(
+            sender_id=self.user.id,
+            receiver_id=receiver.id,
+            hostel_id=self.hostel_id,
+            message=message,
+            timestamp=timezone.now(),
+        )
 
     @sync_to_async
-    def increment_unread_messages(self, receiver):
-        """ Increment unread message counter asynchronously """
-        receiver.unread_messages = F("unread_messages") + 1
-        receiver.save(update_fields=["unread_messages"])
+    def save_message(self, receiver, message):
+        """ Save chat message asynchronously: one INSERT using the cached ids """
+        chat_message = self.build_message(receiver, message)
+        chat_message.save(force_insert=True)
+        return chat_message
+
+    async def write_frame(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
 
     async def send_error(self, error_message):
         """ Send error message to the WebSocket client """
-        await self.send(text_data=json.dumps({"error": error_message}))
+        await self.write_frame(self.codec.error(error_message))
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes the user's new notifications as they are created (see
+    notification_push). ``?last_id=`` replays what was missed since, as
+    ``{"type": "backlog", "notifications": [...], "has_more": bool}``; live
+    ones arrive as ``{"type": "notification", ...}``.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get("user")
+        self.joined = False
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        self.model_label = notification_model(self.user)._meta.label_lower
+        self.group_name = notification_group(self.user.id)
+        # Join before reading the backlog so nothing created in between is missed
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        self.joined = True
+        await self.accept()
+
+        self.last_id = self.requested_last_id()
+        if self.last_id is not None:
+            notifications, has_more = await sync_to_async(backlog)(self.user, self.last_id)
+            if notifications:
+                self.last_id = notifications[-1]["id"]
+            await self.send(text_data=json.dumps({
+                "type": "backlog", "notifications": notifications, "has_more": has_more,
+            }))
+
+    def requested_last_id(self):
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            return int(params["last_id"][0])
+        except (KeyError, ValueError):
+            return None
+
+    async def disconnect(self, close_code):
+        if self.joined:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """ Only pings are expected from the client """
+        await self.send(text_data=json.dumps({"type": "pong"}))
+
+    async def notification_push(self, event):
+        notification = event["notification"]
+        if event["model"] != self.model_label:
+            return
+        # Already sent as part of the backlog
+        if self.last_id is not None and notification["id"] <= self.last_id:
+            return
+        await self.send(text_data=json.dumps({"type": "notification", **notification}))
@@ -0,0 +1,141 @@
+"""
+Location helpers for hostels: Google Maps link parsing, geohash encoding and
+the radius search used by the nearby-hostels endpoint.
+
+Hostels store ``latitude``/``longitude`` plus a geohash (prefix-indexed). A
+radius query first narrows to the handful of geohash cells covering the
+search box, then checks the exact box and the haversine distance in SQL, so
+only nearby rows are ever read. Plain Postgres, no PostGIS needed.
+"""
+import math
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.db.models import F, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+_NUMBER = r'(-?\d{1,3}(?:\.\d+)?)'
+_PIN = re.compile(r'!3d' + _NUMBER + r'!4d' + _NUMBER)  # exact place pin
+_PAIR = re.compile(r'^\s*' + _NUMBER + r'\s*,\s*' + _NUMBER + r'\s*$')
+_VIEWPORT = re.compile(r'@' + _NUMBER + r',' + _NUMBER)  # map centre, least precise
+_QUERY_KEYS = ('q', 'query', 'll', 'destination', 'center', 'sll')
+
+
+def _valid(lat, lng):
+    lat, lng = float(lat), float(lng)
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None
+
+
+def parse_google_maps_link(url):
+    """
+    Extract ``(latitude, longitude)`` from a Google Maps URL, or ``None``.
+
+    Understands place pins (``!3d..!4d..``), coordinate query parameters
+    (``?q=27.7,85.3``, ``query=``, ``ll=`` ...) and the ``@lat,lng,zoom``
+    viewport. Short links (maps.app.goo.gl) have to be expanded first, see
+    the backfill_hostel_coordinates command.
+    """
+    if not url:
+        return None
+    text = unquote(url)
+
+    match = _PIN.search(text)
+    if match:
+        return _valid(*match.groups())
+
+    params = parse_qs(urlparse(text).query)
+    for key in _QUERY_KEYS:
+        for value in params.get(key, []):
+            match = _PAIR.match(value)
+            if match:
+                return _valid(*match.groups())
+
+    match = _VIEWPORT.search(text)
+    if match:
+        return _valid(*match.groups())
+    return None
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            interval[0] = mid
+        else:
+            value *= 2
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value, bits = 0, 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """ ``(height, width)`` of a geohash cell in degrees """
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """ ``(min_lat, max_lat, min_lng, max_lng)`` enclosing the search circle """
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - dlat, -90.0), min(latitude + dlat, 90.0),
+        max(longitude - dlng, -180.0), min(longitude + dlng, 180.0),
+    )
+
+
+def covering_cells(box, max_cells=16):
+    """ The finest set of at most ``max_cells`` geohash prefixes covering ``box`` """
+    min_lat, max_lat, min_lng, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = range(int((min_lat + 90) // height), int((max_lat + 90) // height) + 1)
+        cols = range(int((min_lng + 180) // width), int((max_lng + 180) // width) + 1)
+        if len(rows) * len(cols) <= max_cells:
+            return {
+                geohash_encode(
+                    min(-90 + (row + 0.5) * height, 90.0),
+                    min(-180 + (col + 0.5) * width, 180.0),
+                    precision,
+                )
+                for row in rows for col in cols
+            }
+    return set()
+
+
+def distance_km(latitude, longitude):
+    """ Haversine distance from the given point to each row, as a SQL expression """
+    half_dlat = Radians(F('latitude') - latitude) / 2
+    half_dlng = Radians(F('longitude') - longitude) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(math.radians(latitude)) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """ Rows of ``queryset`` within ``radius_km``, annotated and ordered by ``distance_km`` """
+    box = bounding_box(latitude, longitude, radius_km)
+    cells = Q()
+    for cell in covering_cells(box):
+        cells |= Q(geohash__startswith=cell)
+    min_lat, max_lat, min_lng, max_lng = box
+    return (
+        queryset.filter(cells, latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+        .annotate(distance_km=distance_km(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', 'id')
+    )
@@ -0,0 +1,55 @@
+import requests
+from django.core.management.base import BaseCommand
+
+from hostel_owner.geo import parse_google_maps_link
+from hostel_owner.models import Hostel
+
+
+class Command(BaseCommand):
+    help = "Parse google_maps_link into latitude/longitude/geohash for existing hostels"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-parse hostels that already have coordinates")
+        parser.add_argument(
+            "--resolve-short-links", action="store_true",
+            help="Follow redirects of links that cannot be parsed offline (maps.app.goo.gl etc.)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        hostels = Hostel.objects.exclude(google_maps_link__isnull=True).exclude(google_maps_link="")
+        if not options["all"]:
+            hostels = hostels.filter(latitude__isnull=True)
+
+        updated, unresolved, batch = 0, [], []
+        for hostel in hostels.only("id", "google_maps_link").iterator(chunk_size=options["batch_size"]):
+            coordinates = parse_google_maps_link(hostel.google_maps_link)
+            if not coordinates and options["resolve_short_links"]:
+                coordinates = parse_google_maps_link(self.expand(hostel.google_maps_link))
+            if not coordinates:
+                unresolved.append(hostel.id)
+                continue
+
+            hostel.set_coordinates(coordinates)
+            batch.append(hostel)
+            if len(batch) >= options["batch_size"]:
+                updated += self.flush(batch)
+
+        updated += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f"✅ Stored coordinates for {updated} hostels"))
+        if unresolved:
+            self.stdout.write(self.style.WARNING(f"Could not parse links of hostels: {unresolved}"))
+
+    def flush(self, batch):
+        count = len(batch)
+        if batch:
+            Hostel.objects.bulk_update(batch, ["latitude", "longitude", "geohash"])
+            batch.clear()
+        return count
+
+    def expand(self, url):
+        try:
+            return requests.head(url, allow_redirects=True, timeout=10).url
+        except requests.RequestException as e:
+            self.stderr.write(f"Could not expand {url}: {e}")
+            return None
@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+GROUP = "channel_layer_benchmark"
+
+
+def make_layer(kind):
+    if kind == "memory":
+        from channels.layers import InMemoryChannelLayer
+        return InMemoryChannelLayer(capacity=10_000)
+    from hostel_owner.channel_layers import PostgresChannelLayer
+    return PostgresChannelLayer(capacity=10_000)
+
+
+async def receive_all(layer, channel, messages, timeout):
+    """ Receive ``messages`` messages on ``channel``, returning their latencies in ms """
+    latencies = []
+    deadline = time.monotonic() + timeout
+    while len(latencies) < messages:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            message = await asyncio.wait_for(layer.receive(channel), remaining)
+        except asyncio.TimeoutError:
+            break
+        latencies.append((time.time() - message["sent"]) * 1000)
+    return latencies
+
+
+def worker_process(kind, sockets, messages, timeout, ready, results):
+    """ One ASGI-like worker: ``sockets`` channels in the group, reporting latencies back """
+    django.setup()
+
+    async def run():
+        layer = make_layer(kind)
+        channels = [await layer.new_channel() for _ in range(sockets)]
+        for channel in channels:
+            await layer.group_add(GROUP, channel)
+        ready.put(True)
+        per_channel = await asyncio.gather(*(receive_all(layer, c, messages, timeout) for c in channels))
+        for channel in channels:
+            await layer.group_discard(GROUP, channel)
+        await layer.close()
+        return [latency for latencies in per_channel for latency in latencies]
+
+    results.put(asyncio.run(run()))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure group_send fan-out throughput of the in-memory and Postgres channel layers. "
+        "The in-memory layer cannot cross processes, so its 'workers' are task groups in this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+        parser.add_argument("--layers", nargs="+", choices=["memory", "postgres"], default=["memory", "postgres"])
+        parser.add_argument("--sockets", type=int, default=20, help="Group members per worker")
+        parser.add_argument("--messages", type=int, default=500, help="group_send calls per run")
+        parser.add_argument("--timeout", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'layer':<9} {'workers':>7} {'sent/s':>9} {'delivered/s':>12} {'lost':>6} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        for kind in options["layers"]:
+            for workers in options["workers"]:
+                if kind == "memory":
+                    sent_rate, latencies = asyncio.run(self.run_memory(workers, options))
+                else:
+                    sent_rate, latencies = self.run_postgres(workers, options)
+                self.report(kind, workers, options, sent_rate, latencies)
+
+    async def send_messages(self, layer, count):
+        started = time.perf_counter()
+        for n in range(count):
+            await layer.group_send(GROUP, {"type": "chat.message", "n": n, "sent": time.time()})
+        return count / (time.perf_counter() - started)
+
+    async def run_memory(self, workers, options):
+        layer = make_layer("memory")
+        channels = [await layer.new_channel() for _ in range(workers * options["sockets"])]
+        for channel in channels:
+            await layer.group_add(GROUP, channel)
+        receivers = [
+            asyncio.ensure_future(receive_all(layer, c, options["messages"], options["timeout"]))
+            for c in channels
+        ]
+        sent_rate = await self.send_messages(layer, options["messages"])
+        per_channel = await asyncio.gather(*receivers)
+        await layer.flush()
+        return sent_rate, [latency for latencies in per_channel for latency in latencies]
+
+    def run_postgres(self, workers, options):
+        context = multiprocessing.get_context("spawn")
+        ready, results = context.Queue(), context.Queue()
+        processes = [
+            context.Process(
+                target=worker_process,
+                args=("postgres", options["sockets"], options["messages"], options["timeout"], ready, results),
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for _ in processes:
+                ready.get(timeout=options["timeout"])
+        except Exception:
+            for process in processes:
+                process.terminate()
+            raise CommandError("Workers did not join the group in time; is the database reachable?")
+
+        async def send():
+            layer = make_layer("postgres")
+            try:
+                return await self.send_messages(layer, options["messages"])
+            finally:
+                await layer.close()
+
+        sent_rate = asyncio.run(send())
+        latencies = []
+        for _ in processes:
+            latencies.extend(results.get(timeout=options["timeout"] + 30))
+        for process in processes:
+            process.join()
+        return sent_rate, latencies
+
+    def report(self, kind, workers, options, sent_rate, latencies):
+        expected = workers * options["sockets"] * options["messages"]
+        if not latencies:
+            self.stdout.write(f"{kind:<9} {workers:>7} {sent_rate:>9.0f} {'-':>12} {expected:>6}")
+            return
+        latencies.sort()
+        elapsed = options["messages"] / sent_rate + latencies[-1] / 1000
+        self.stdout.write(
+            f"{kind:<9} {workers:>7} {sent_rate:>9.0f} {len(latencies) / elapsed:>12.0f} "
+            f"{expected - len(latencies):>6} {statistics.median(latencies):>8.2f} "
+            f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f} {latencies[-1]:>8.2f}"
+        )
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import CustomUser
+from hostel_owner.chat_buffer import ChatWriteBuffer
+from hostel_owner.models import ChatMessage, Hostel
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare chat message persistence per message (one INSERT through sync_to_async each) "
+        "with write-behind batching. The benchmark users, hostel and messages are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=5000)
+        parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 500])
+        parser.add_argument("--flush-seconds", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        owner = CustomUser.objects.create(
+            username="chat-benchmark-owner", email="chat-benchmark-owner@example.invalid", role=CustomUser.HOSTEL_OWNER,
+        )
+        student = CustomUser.objects.create(
+            username="chat-benchmark-student", email="chat-benchmark-student@example.invalid", role=CustomUser.STUDENT,
+        )
+        hostel = Hostel.objects.create(owner=owner, name="Chat Benchmark Hostel", address="-", description="-")
+        try:
+            count = options["messages"]
+            self.stdout.write(f"{'mode':<22} {'messages':>8} {'seconds':>8} {'msg/s':>9}")
+
+            elapsed = asyncio.run(self.run_direct(hostel, owner, student, count))
+            self.report("per-message INSERT", count, elapsed)
+
+            for batch_size in options["batch_sizes"]:
+                buffer = ChatWriteBuffer(batch_size, options["flush_seconds"])
+                elapsed = asyncio.run(self.run_buffered(buffer, hostel, owner, student, count))
+                self.report(f"write-behind x{batch_size}", buffer.written, elapsed)
+        finally:
+            owner.delete()
+            student.delete()
+
+    def messages(self, hostel, owner, student, count):
+        for n in range(count):
+            sender, receiver = (student, owner) if n % 2 == 0 else (owner, student)
+            yield ChatMessage(
+                sender_id=sender.id, receiver_id=receiver.id, hostel_id=hostel.id,
+                message=f"benchmark message {n}", timestamp=timezone.now(),
+            )
+
+    async def run_direct(self, hostel, owner, student, count):
+        save = sync_to_async(lambda message: message.save(force_insert=True))
+        started = time.perf_counter()
+        for message in self.messages(hostel, owner, student, count):
+            await save(message)
+        return time.perf_counter() - started
+
+    async def run_buffered(self, buffer, hostel, owner, student, count):
+        started = time.perf_counter()
+        for message in self.messages(hostel, owner, student, count):
+            buffer.add(message)
+            # Let scheduled flushes run, as a busy consumer would between frames.
+            await asyncio.sleep(0)
+        await buffer.flush()
+        return time.perf_counter() - started
+
+    def report(self, mode, count, elapsed):
+        self.stdout.write(f"{mode:<22} {count:>8} {elapsed:>8.2f} {count / elapsed:>9.0f}")
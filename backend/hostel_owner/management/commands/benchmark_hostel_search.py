@@ -0,0 +1,98 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import CustomUser
+from hostel_owner.models import Hostel
+from hostel_owner.search import search_hostels
+
+CITIES = ["Kathmandu", "Lalitpur", "Bhaktapur", "Pokhara", "Biratnagar", "Chitwan", "Dharan", "Butwal"]
+AREAS = ["Baneshwor", "Putalisadak", "Kirtipur", "Jawalakhel", "Lakeside", "Koteshwor", "Balkhu", "Chabahil"]
+COLLEGES = [
+    "Tribhuvan University", "Kathmandu University", "Pulchowk Campus", "Islington College",
+    "Herald College", "Softwarica College", "Prithvi Narayan Campus",
+]
+WORDS = [
+    "quiet", "spacious", "clean", "girls", "boys", "study", "rooftop", "garden", "hot",
+    "water", "mess", "library", "gym", "cozy", "affordable", "furnished", "sunny",
+]
+QUERIES = [
+    "Kathmandu",
+    "girls hostel",
+    "Pulchowk Campus",
+    "quiet study rooftop",
+    '"Kathmandu University"',
+    "Lakeside -boys",
+    "gym or library",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark hostel full-text search against seeded hostels (all seeded rows are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Number of hostels to seed")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--explain", action="store_true", help="Print the query plan of each query")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            owner = CustomUser.objects.create(
+                username="search-benchmark-owner",
+                email="search-benchmark@example.invalid",
+                role=CustomUser.HOSTEL_OWNER,
+            )
+            started = time.perf_counter()
+            self.seed(owner, options["rows"], rng)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE hostel_owner_hostel")
+            self.stdout.write(f"Seeded {options['rows']} hostels in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(f"{'query':<28} {'matches':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            for terms in QUERIES:
+                params = {"search": terms}
+                page = search_hostels(Hostel.objects.all(), params).order_by("-rank", "-id")[:options["page_size"]]
+                matches = search_hostels(Hostel.objects.all(), params).count()
+
+                timings = []
+                for _ in range(options["repeat"]):
+                    t0 = time.perf_counter()
+                    list(page.values_list("id", "rank"))
+                    timings.append((time.perf_counter() - t0) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f"{terms:<28} {matches:>8} {statistics.median(timings):>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}"
+                )
+                if options["explain"]:
+                    self.stdout.write(page.values_list("id", "rank").explain(analyze=True))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished, seeded rows rolled back"))
+
+    def seed(self, owner, rows, rng):
+        batch = []
+        for i in range(rows):
+            city = rng.choice(CITIES)
+            area = rng.choice(AREAS)
+            batch.append(Hostel(
+                owner=owner,
+                name=f"{area} {rng.choice(['Boys', 'Girls', 'Students'])} Hostel {i}",
+                address=f"{area}, {city}",
+                city=city,
+                description=" ".join(rng.choices(WORDS, k=30)),
+                nearby_colleges=", ".join(rng.sample(COLLEGES, 2)),
+            ))
+            if len(batch) == 5000:
+                Hostel.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Hostel.objects.bulk_create(batch)
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends import utils as db_utils
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import CustomUser
+from hostel_owner.chat_buffer import chat_write_buffer
+from hostel_owner.models import Hostel
+
+try:
+    import websockets
+except ImportError:  # only needed for --url
+    websockets = None
+
+MARKER = "loadtest:"
+
+
+class QueryCounter:
+    """ Counts every SQL statement run through Django cursors, from any thread """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._originals = None
+
+    def __enter__(self):
+        counter = self
+        originals = (db_utils.CursorWrapper.execute, db_utils.CursorWrapper.executemany)
+
+        def execute(cursor, *args, **kwargs):
+            counter.add()
+            return originals[0](cursor, *args, **kwargs)
+
+        def executemany(cursor, *args, **kwargs):
+            counter.add()
+            return originals[1](cursor, *args, **kwargs)
+
+        self._originals = originals
+        db_utils.CursorWrapper.execute, db_utils.CursorWrapper.executemany = execute, executemany
+        return self
+
+    def __exit__(self, *exc):
+        db_utils.CursorWrapper.execute, db_utils.CursorWrapper.executemany = self._originals
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+
+class CommunicatorClient:
+    """ In-process client driving the ASGI application directly """
+
+    def __init__(self, path):
+        from backend.asgi import application
+        self.communicator = WebsocketCommunicator(application, path)
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        return connected
+
+    async def send(self, data):
+        await self.communicator.send_to(text_data=json.dumps(data))
+
+    async def recv(self, timeout):
+        # receive_from() kills the application when it times out, so wait on the output queue instead
+        message = await asyncio.wait_for(self.communicator.output_queue.get(), timeout)
+        if message["type"] != "websocket.send":
+            raise CommandError(f"Socket closed by the server: {message}")
+        return json.loads(message["text"])
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class SocketClient:
+    """ Client over a real socket to a running daphne/uvicorn server """
+
+    def __init__(self, base_url, path):
+        self.url = base_url.rstrip("/") + path
+
+    async def connect(self):
+        try:
+            self.socket = await websockets.connect(self.url)
+        except Exception:
+            return False
+        return True
+
+    async def send(self, data):
+        await self.socket.send(json.dumps(data))
+
+    async def recv(self, timeout):
+        return json.loads(await asyncio.wait_for(self.socket.recv(), timeout))
+
+    async def close(self):
+        await self.socket.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test ChatConsumer: students and owners across hostels chatting at a fixed rate. "
+        "Reports delivery latency percentiles, throughput and DB queries per message. "
+        "Runs in-process through WebsocketCommunicator unless --url points at a server. "
+        "The users and hostels it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hostels", type=int, default=5, help="M hostels, each with one owner")
+        parser.add_argument("--students", type=int, default=10, help="N students per hostel")
+        parser.add_argument("--rate", type=float, default=1.0, help="Messages per second sent by each participant")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds of sending")
+        parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for late deliveries")
+        parser.add_argument("--url", help="Base URL of a running server, e.g. ws://127.0.0.1:8001")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["url"] and websockets is None:
+            raise CommandError("--url needs the 'websockets' package")
+        rng = random.Random(options["seed"])
+        owners, hostels, students = self.create_fixtures(options["hostels"], options["students"])
+        try:
+            with QueryCounter() as queries:
+                # Not asyncio.run(): the consumers' database calls must use this thread's connection
+                results = async_to_sync(self.run)(owners, hostels, students, options, rng, queries)
+        finally:
+            CustomUser.objects.filter(id__in=[u.id for u in owners + students]).delete()
+        self.report(results, options)
+
+    def create_fixtures(self, hostel_count, students_per_hostel):
+        tag = f"{int(time.time())}-{random.randrange(10**6)}"
+        owners = CustomUser.objects.bulk_create([
+            CustomUser(username=f"lt-owner-{tag}-{h}", email=f"lt-owner-{tag}-{h}@example.invalid",
+                       role=CustomUser.HOSTEL_OWNER, is_verified=True)
+            for h in range(hostel_count)
+        ])
+        hostels = [
+            Hostel.objects.create(owner=owner, name=f"Load Test Hostel {tag}-{h}", address="-", description="-")
+            for h, owner in enumerate(owners)
+        ]
+        students = CustomUser.objects.bulk_create([
+            CustomUser(username=f"lt-student-{tag}-{h}-{s}", email=f"lt-student-{tag}-{h}-{s}@example.invalid",
+                       role=CustomUser.STUDENT, is_verified=True)
+            for h in range(hostel_count) for s in range(students_per_hostel)
+        ])
+        return owners, hostels, students
+
+    def client(self, options, hostel, user):
+        path = f"/ws/chat/{hostel.id}/?token={AccessToken.for_user(user)}"
+        if options["url"]:
+            return SocketClient(options["url"], path)
+        return CommunicatorClient(path)
+
+    async def run(self, owners, hostels, students, options, rng, queries):
+        per_hostel = options["students"]
+        participants = []  # (client, user, hostel_index)
+        for h, hostel in enumerate(hostels):
+            participants.append((self.client(options, hostel, owners[h]), owners[h], h))
+            for student in students[h * per_hostel:(h + 1) * per_hostel]:
+                participants.append((self.client(options, hostel, student), student, h))
+
+        connected = await asyncio.gather(*(client.connect() for client, _, _ in participants))
+        if not all(connected):
+            raise CommandError(f"{connected.count(False)} of {len(connected)} sockets failed to connect")
+
+        latencies, errors = [], []
+        sent = [0]
+        stop_reading = asyncio.Event()
+
+        async def read(client, user):
+            while not stop_reading.is_set():
+                try:
+                    frame = await client.recv(timeout=0.5)
+                except (asyncio.TimeoutError, TimeoutError):
+                    continue
+                if "error" in frame:
+                    errors.append(frame["error"])
+                    continue
+                text = frame.get("message", "")
+                if text.startswith(MARKER) and frame.get("sender_id") != user.id:
+                    latencies.append((time.time() - float(text[len(MARKER):])) * 1000)
+
+        async def write(client, user, h):
+            deadline = time.monotonic() + options["duration"]
+            interval = 1 / options["rate"]
+            await asyncio.sleep(rng.random() * interval)
+            while time.monotonic() < deadline:
+                payload = {"message": f"{MARKER}{time.time()}"}
+                if user.id == owners[h].id:
+                    payload["receiver_id"] = rng.choice(students[h * per_hostel:(h + 1) * per_hostel]).id
+                await client.send(payload)
+                sent[0] += 1
+                await asyncio.sleep(interval)
+
+        readers = [asyncio.ensure_future(read(client, user)) for client, user, _ in participants]
+        queries.reset()
+        started = time.perf_counter()
+        await asyncio.gather(*(write(client, user, h) for client, user, h in participants))
+        sending_seconds = time.perf_counter() - started
+        await asyncio.sleep(options["drain"])
+        if settings.CHAT_WRITE_BEHIND and not options["url"]:
+            await chat_write_buffer().flush()
+        query_count = queries.count
+
+        stop_reading.set()
+        await asyncio.gather(*readers)
+        await asyncio.gather(*(client.close() for client, _, _ in participants))
+        return {
+            "sockets": len(participants),
+            "sent": sent[0],
+            "seconds": sending_seconds,
+            "latencies": sorted(latencies),
+            "errors": errors,
+            "queries": None if options["url"] else query_count,
+        }
+
+    def report(self, results, options):
+        latencies, sent = results["latencies"], results["sent"]
+        self.stdout.write(f"sockets            {results['sockets']} ({options['hostels']} hostels)")
+        self.stdout.write(f"messages sent      {sent} in {results['seconds']:.1f}s ({sent / results['seconds']:.0f}/s)")
+        self.stdout.write(f"deliveries         {len(latencies)} ({len(latencies) / results['seconds']:.0f}/s)")
+        if latencies:
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+            self.stdout.write(
+                f"latency ms         p50 {statistics.median(latencies):.1f}  p95 {pct(0.95):.1f}  "
+                f"p99 {pct(0.99):.1f}  max {latencies[-1]:.1f}"
+            )
+        if results["queries"] is not None and sent:
+            self.stdout.write(f"queries/message    {results['queries'] / sent:.2f} ({results['queries']} total)")
+        if results["errors"]:
+            counts = {}
+            for error in results["errors"]:
+                counts[error] = counts.get(error, 0) + 1
+            for error, count in sorted(counts.items(), key=lambda item: -item[1]):
+                self.stdout.write(f"error              {count} x {error}")
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from hostel_owner.models import ChatMessage
+from hostel_owner.partitions import PARTITIONED_TABLES, default_partition, ensure_partitions, qn
+from hostel_owner.retention import RETAINED_MODELS, RETENTION_BATCH_SIZE, apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the coming monthly partitions of the notification and chat tables and apply retention: "
+        "read notifications older than NOTIFICATION_RETENTION_DAYS and chat messages older than "
+        "CHAT_RETENTION_DAYS go, whole months at a time where possible. Meant to run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+        parser.add_argument(
+            "--archive", action="store_true",
+            help="Copy expired rows to <table>_archive before removing them",
+        )
+        parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+        parser.add_argument("--skip-retention", action="store_true", help="Only create partitions")
+
+    def handle(self, *args, **options):
+        for table, column in PARTITIONED_TABLES.items():
+            with transaction.atomic(), connection.cursor() as cursor:
+                for name in ensure_partitions(cursor, table, column, options["months_ahead"]):
+                    self.stdout.write(f"{table}: created {name}")
+
+        if not options["skip_retention"]:
+            now = timezone.now()
+            for model in RETAINED_MODELS:
+                days = settings.CHAT_RETENTION_DAYS if model is ChatMessage else settings.NOTIFICATION_RETENTION_DAYS
+                if days is None:
+                    continue
+                table = model._meta.db_table
+                dropped, deleted = apply_retention(
+                    model, now - timedelta(days=days), archive=options["archive"], batch_size=options["batch_size"],
+                )
+                for name in dropped:
+                    self.stdout.write(f"{table}: {'archived' if options['archive'] else 'dropped'} {name}")
+                self.stdout.write(f"{table}: removed {deleted} more rows older than {days} days")
+
+        with connection.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                cursor.execute(f"SELECT count(*) FROM {qn(default_partition(table))}")
+                stray = cursor.fetchone()[0]
+                if stray:
+                    self.stdout.write(self.style.WARNING(
+                        f"{table}: {stray} rows in {default_partition(table)}, outside every monthly partition"
+                    ))
+
+        self.stdout.write(self.style.SUCCESS("Partitions up to date"))
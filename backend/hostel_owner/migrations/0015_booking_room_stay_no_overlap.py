@@ -0,0 +1,71 @@
+import logging
+
+import django.contrib.postgres.constraints
+import hostel_owner.models
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+logger = logging.getLogger(__name__)
+
+
+def check_existing_bookings(apps, schema_editor):
+    """
+    Make existing rows satisfy the constraint before it is added.
+
+    Active bookings with check_in after check_out cannot be turned into a date
+    range, and there is no safe way to guess the intended dates, so the
+    migration stops and lists them. Overlapping active bookings of a room are
+    resolved by rejecting the later ones (by created_at), which is what the
+    constraint would have done had it existed when they were made.
+    """
+    Booking = apps.get_model('hostel_owner', 'Booking')
+    active = Booking.objects.filter(status__in=ACTIVE_STATUSES)
+
+    inverted = list(active.filter(check_in__gt=models.F('check_out')).values_list('id', flat=True))
+    if inverted:
+        raise RuntimeError(
+            f"Bookings {inverted} are pending/confirmed with check_in after check_out. "
+            "Fix their dates or set their status to 'rejected', then run migrate again."
+        )
+
+    kept, rejected = {}, []
+    for booking_id, room_id, check_in, check_out in active.order_by('room_id', 'created_at', 'id').values_list(
+        'id', 'room_id', 'check_in', 'check_out'
+    ):
+        stays = kept.setdefault(room_id, [])
+        if any(check_in < end and start < check_out for start, end in stays):
+            rejected.append(booking_id)
+        else:
+            stays.append((check_in, check_out))
+    if rejected:
+        Booking.objects.filter(id__in=rejected).update(status='rejected')
+        logger.warning(
+            "Rejected %d bookings overlapping an earlier booking of the same room: %s", len(rejected), rejected
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0014_feedback_reply_alter_feedback_hostel_and_more'),
+    ]
+
+    operations = [
+        # Needed for the "room WITH =" part of the GiST exclusion constraint.
+        BtreeGistExtension(),
+        migrations.RunPython(check_existing_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                condition=models.Q(('status__in', ('pending', 'confirmed'))),
+                expressions=[
+                    ('room', '='),
+                    (hostel_owner.models.StayRange('check_in', 'check_out'), '&&'),
+                ],
+                name='booking_room_stay_no_overlap',
+            ),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0015_booking_room_stay_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(fields=['created_at', 'id'], name='hostel_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Weights: name A, city/address B, nearby_colleges C, description D.
+# The text search config must match hostel_owner.search.SEARCH_CONFIG.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION hostel_owner_hostel_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.city, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.address, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.nearby_colleges, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER hostel_owner_hostel_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, city, address, nearby_colleges, description
+    ON hostel_owner_hostel
+    FOR EACH ROW EXECUTE FUNCTION hostel_owner_hostel_search_vector_update();
+
+UPDATE hostel_owner_hostel SET name = name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS hostel_owner_hostel_search_vector_trigger ON hostel_owner_hostel;
+DROP FUNCTION IF EXISTS hostel_owner_hostel_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0016_hostel_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostel',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='hostel_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(django.db.models.functions.text.Upper('city'), name='hostel_city_upper_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# Frozen copy of hostel_owner.models.AMENITY_FLAGS at the time of this migration.
+AMENITY_FLAGS = (
+    'wifi', 'parking', 'laundry', 'security_guard', 'mess_service',
+    'attached_bathroom', 'air_conditioning', 'heater', 'balcony',
+    'smoking_allowed', 'alcohol_allowed', 'pets_allowed',
+)
+
+
+def backfill_amenity_mask(apps, schema_editor):
+    Hostel = apps.get_model('hostel_owner', 'Hostel')
+    mask = sum(
+        (models.Case(models.When(**{name: True}, then=1 << bit), default=0) for bit, name in enumerate(AMENITY_FLAGS)),
+        models.Value(0),
+    )
+    Hostel.objects.update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0017_hostel_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostel',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenity_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0018_hostel_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostel',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(fields=['geohash'], name='hostel_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_room_stats(apps, schema_editor):
+    Hostel = apps.get_model('hostel_owner', 'Hostel')
+    Room = apps.get_model('hostel_owner', 'Room')
+
+    def per_hostel(aggregate, output_field=None):
+        rooms = (
+            Room.objects.filter(floor__hostel=models.OuterRef('pk'))
+            .order_by()
+            .values('floor__hostel')
+            .annotate(value=aggregate)
+            .values('value')
+        )
+        return models.Subquery(rooms, output_field=output_field)
+
+    Hostel.objects.update(
+        room_price_min=per_hostel(models.Min('price')),
+        room_price_max=per_hostel(models.Max('price')),
+        total_rooms=Coalesce(per_hostel(models.Count('id'), models.IntegerField()), 0),
+        available_rooms=Coalesce(
+            per_hostel(models.Count('id', filter=models.Q(is_available=True)), models.IntegerField()), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0019_hostel_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostel',
+            name='room_price_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='room_price_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='total_rooms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='available_rooms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(fields=['room_price_min', 'room_price_max'], name='hostel_room_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(condition=models.Q(('available_rooms__gt', 0)), fields=['created_at', 'id'], name='hostel_vacancy_idx'),
+        ),
+        migrations.RunPython(backfill_room_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0020_hostel_room_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hostel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
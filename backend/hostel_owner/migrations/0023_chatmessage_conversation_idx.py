@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0022_channel_layer_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['hostel', 'sender', 'receiver', 'id'], name='chatmsg_conversation_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+CONVERSATION_TRIGGER = """
+CREATE OR REPLACE FUNCTION hostel_owner_chatmessage_conversation() RETURNS trigger AS $$
+DECLARE
+    hostel_owner_id bigint;
+    to_owner boolean;
+BEGIN
+    SELECT owner_id INTO hostel_owner_id FROM hostel_owner_hostel WHERE id = NEW.hostel_id;
+    IF hostel_owner_id IS NULL OR hostel_owner_id NOT IN (NEW.sender_id, NEW.receiver_id) THEN
+        RETURN NULL;
+    END IF;
+    to_owner := NEW.receiver_id = hostel_owner_id;
+
+    INSERT INTO hostel_owner_conversation AS c (
+        hostel_id, owner_id, student_id, last_message_id, last_message, last_sender_id,
+        last_message_at, owner_unread, student_unread
+    ) VALUES (
+        NEW.hostel_id, hostel_owner_id, CASE WHEN to_owner THEN NEW.sender_id ELSE NEW.receiver_id END,
+        NEW.id, left(NEW.message, 200), NEW.sender_id, NEW.timestamp,
+        CASE WHEN to_owner THEN 1 ELSE 0 END, CASE WHEN to_owner THEN 0 ELSE 1 END
+    )
+    ON CONFLICT (hostel_id, student_id) DO UPDATE SET
+        owner_unread = c.owner_unread + EXCLUDED.owner_unread,
+        student_unread = c.student_unread + EXCLUDED.student_unread,
+        last_message_id = EXCLUDED.last_message_id,
+        last_message = EXCLUDED.last_message,
+        last_sender_id = EXCLUDED.last_sender_id,
+        last_message_at = EXCLUDED.last_message_at
+    WHERE c.last_message_id IS NULL OR c.last_message_id < EXCLUDED.last_message_id;
+
+    IF NOT FOUND THEN
+        -- An older message committed after a newer one: count it, keep the newer preview.
+        UPDATE hostel_owner_conversation
+        SET owner_unread = owner_unread + CASE WHEN to_owner THEN 1 ELSE 0 END,
+            student_unread = student_unread + CASE WHEN to_owner THEN 0 ELSE 1 END
+        WHERE hostel_id = NEW.hostel_id
+          AND student_id = CASE WHEN to_owner THEN NEW.sender_id ELSE NEW.receiver_id END;
+    END IF;
+
+    UPDATE api_customuser SET unread_messages = unread_messages + 1 WHERE id = NEW.receiver_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER hostel_owner_chatmessage_conversation
+AFTER INSERT ON hostel_owner_chatmessage
+FOR EACH ROW EXECUTE FUNCTION hostel_owner_chatmessage_conversation();
+"""
+
+DROP_CONVERSATION_TRIGGER = """
+DROP TRIGGER IF EXISTS hostel_owner_chatmessage_conversation ON hostel_owner_chatmessage;
+DROP FUNCTION IF EXISTS hostel_owner_chatmessage_conversation();
+"""
+
+# Existing chats start with nothing unread; unread_messages was never incremented.
+BACKFILL = """
+INSERT INTO hostel_owner_conversation (
+    hostel_id, owner_id, student_id, last_message_id, last_message, last_sender_id,
+    last_message_at, owner_unread, student_unread
+)
+SELECT DISTINCT ON (m.hostel_id, student_id)
+    m.hostel_id, h.owner_id,
+    CASE WHEN m.sender_id = h.owner_id THEN m.receiver_id ELSE m.sender_id END AS student_id,
+    m.id, left(m.message, 200), m.sender_id, m.timestamp, 0, 0
+FROM hostel_owner_chatmessage m
+JOIN hostel_owner_hostel h ON h.id = m.hostel_id
+WHERE h.owner_id IN (m.sender_id, m.receiver_id)
+ORDER BY m.hostel_id, student_id, m.id DESC
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0023_chatmessage_conversation_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_message', models.TextField(blank=True, default='')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('owner_unread', models.PositiveIntegerField(default=0)),
+                ('student_unread', models.PositiveIntegerField(default=0)),
+                ('hostel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='hostel_owner.hostel')),
+                ('last_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_conversations', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['owner', '-last_message_at'], name='conversation_owner_inbox_idx'),
+                    models.Index(fields=['student', '-last_message_at'], name='conversation_student_inbox_idx'),
+                ],
+                'constraints': [models.UniqueConstraint(fields=('hostel', 'student'), name='conversation_hostel_student_unique')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunSQL(CONVERSATION_TRIGGER, DROP_CONVERSATION_TRIGGER),
+    ]
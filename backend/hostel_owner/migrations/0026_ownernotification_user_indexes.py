@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0025_chatmessage_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ownernotification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='ownernotif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ownernotification',
+            index=models.Index(fields=['user', 'id'], name='ownernotif_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0026_ownernotification_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ownernotification',
+            index=models.Index(condition=models.Q(is_read=False), fields=['user'], name='ownernotif_user_unread_idx'),
+        ),
+    ]
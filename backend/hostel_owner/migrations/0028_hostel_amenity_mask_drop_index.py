@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0027_ownernotification_user_unread_idx'),
+    ]
+
+    operations = [
+        # The btree added in 0018 was never used: amenity filters are bitwise (amenity_mask & x = x)
+        migrations.AlterField(
+            model_name='hostel',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0028_hostel_amenity_mask_drop_index'),
+    ]
+
+    operations = [
+        # Added without a default so existing rows stay NULL instead of all sharing one
+        # uuid, and the table is not rewritten; new rows get uuid4() from the model default.
+        migrations.AddField(
+            model_name='chatmessage',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, null=True),
+        ),
+    ]
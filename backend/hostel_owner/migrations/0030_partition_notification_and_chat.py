@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from hostel_owner.partitions import convert_to_partitioned, refuse_to_unpartition
+
+
+def partition_tables(apps, schema_editor):
+    convert_to_partitioned(schema_editor, "hostel_owner_ownernotification", "created_at")
+    convert_to_partitioned(schema_editor, "hostel_owner_chatmessage", "timestamp")
+
+
+# The trigger from 0024 went away with the old chat table; the function is still there.
+CONVERSATION_TRIGGER = """
+CREATE TRIGGER hostel_owner_chatmessage_conversation
+AFTER INSERT ON hostel_owner_chatmessage
+FOR EACH ROW EXECUTE FUNCTION hostel_owner_chatmessage_conversation();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel_owner', '0029_chatmessage_uid'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, refuse_to_unpartition),
+        migrations.RunSQL(CONVERSATION_TRIGGER, migrations.RunSQL.noop),
+    ]
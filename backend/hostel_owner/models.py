@@ -1,6 +1,23 @@
+import uuid
+
 from django.db import models
+from django.db.models import F, Func, Q
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Upper
 from django.core.exceptions import ObjectDoesNotExist
 from api.models import CustomUser
+from .geo import geohash_encode, parse_google_maps_link
+
+# Bit positions of Hostel.amenity_mask. Append only: reordering changes stored masks.
+AMENITY_FLAGS = (
+    'wifi', 'parking', 'laundry', 'security_guard', 'mess_service',
+    'attached_bathroom', 'air_conditioning', 'heater', 'balcony',
+    'smoking_allowed', 'alcohol_allowed', 'pets_allowed',
+)
+
 
 class Hostel(models.Model):
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 'HostelOwner'})
@@ -14,6 +31,10 @@ class Hostel(models.Model):
     state = models.CharField(max_length=100, blank=True, null=True)
     zip_code = models.CharField(max_length=10, blank=True, null=True)
     google_maps_link = models.URLField(blank=True, null=True)
+    # Derived from google_maps_link on save (see hostel_owner.geo).
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
     wifi = models.BooleanField(default=False)
     parking = models.BooleanField(default=False)
     laundry = models.BooleanField(default=False)
@@ -33,8 +54,66 @@ class Hostel(models.Model):
     nearby_colleges = models.TextField(blank=True, null=True)
     nearby_markets = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every change to the hostel or its floors, rooms and images, so
+    # conditional GETs can be answered from this row alone (see conditional.py).
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
     cancellation_policy = models.JSONField(default=dict)
-    
+    # Maintained by a database trigger from name/city/address/nearby_colleges/description,
+    # see migration 0017 and hostel_owner.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Packed copy of the AMENITY_FLAGS booleans, recomputed on every save. Not indexed:
+    # a btree cannot serve the bitwise filter, which is applied to the rows left by the other filters.
+    amenity_mask = models.PositiveIntegerField(default=0, editable=False)
+    # Aggregates over this hostel's rooms, maintained by hostel_owner.signals.
+    room_price_min = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    room_price_max = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    total_rooms = models.PositiveIntegerField(default=0, editable=False)
+    available_rooms = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination key for the public listings (see pagination.py).
+            models.Index(fields=['created_at', 'id'], name='hostel_created_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='hostel_search_vector_idx'),
+            models.Index(Upper('city'), name='hostel_city_upper_idx'),
+            # Prefix (LIKE 'abc%') lookups for the nearby-hostels search.
+            models.Index(fields=['geohash'], name='hostel_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['room_price_min', 'room_price_max'], name='hostel_room_price_idx'),
+            models.Index(fields=['created_at', 'id'], condition=Q(available_rooms__gt=0), name='hostel_vacancy_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.amenity_mask = sum(1 << bit for bit, name in enumerate(AMENITY_FLAGS) if getattr(self, name))
+        self.set_coordinates()
+        bump = not self._state.adding
+        if bump:
+            # In SQL: room/image changes bump it concurrently, this instance may be stale
+            self.version = F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'version', 'updated_at'}
+            if update_fields & set(AMENITY_FLAGS):
+                update_fields.add('amenity_mask')
+            if 'google_maps_link' in update_fields:
+                update_fields |= {'latitude', 'longitude', 'geohash'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+
+    def set_coordinates(self, coordinates=None):
+        """
+        Refresh latitude/longitude/geohash from google_maps_link. Links that
+        cannot be parsed offline (short links) keep the stored coordinates.
+        """
+        coordinates = coordinates or parse_google_maps_link(self.google_maps_link)
+        if coordinates:
+            self.latitude, self.longitude = coordinates
+        elif not self.google_maps_link:
+            self.latitude = self.longitude = None
+        self.geohash = geohash_encode(self.latitude, self.longitude) if self.latitude is not None else None
+
     def __str__(self):
         return self.name
 
@@ -77,6 +156,20 @@ class RoomImage(models.Model):
     class Meta:
         ordering = ['position']
 
+# Bookings in these states hold their room for the stay; rejected or
+# canceled ones free it again.
+ACTIVE_BOOKING_STATUSES = ('pending', 'confirmed')
+
+
+class StayRange(Func):
+    """ Half-open ``[check_in, check_out)`` date range of a booking """
+    function = 'DATERANGE'
+    output_field = DateRangeField()
+
+    def __init__(self, check_in, check_out, **extra):
+        super().__init__(check_in, check_out, RangeBoundary(), **extra)
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -91,6 +184,21 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True) 
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="bookings")
     pidx = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # GiST index over (room, stay): rejects double bookings and serves
+            # the overlap probes in hostel_owner.availability.
+            ExclusionConstraint(
+                name='booking_room_stay_no_overlap',
+                expressions=[
+                    ('room', RangeOperators.EQUAL),
+                    (StayRange('check_in', 'check_out'), RangeOperators.OVERLAPS),
+                ],
+                condition=Q(status__in=ACTIVE_BOOKING_STATUSES),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.student.username} - {self.room.room_number} ({self.status})"
 
@@ -126,24 +234,80 @@ class HostelImage(models.Model):
 from django.db import models
 from api.models import CustomUser
 from datetime import datetime
+from django.utils import timezone
 
+# Partitioned by month on timestamp (partitions.py); nothing may reference it by foreign key
 class ChatMessage(models.Model):
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="sent_messages")
     receiver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="received_messages")
     hostel = models.ForeignKey("Hostel", on_delete=models.CASCADE)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set on arrival rather than on insert, so write-behind batches keep the real time
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    # Known before the row is written, so write-behind broadcasts can name the message
+    # while "id" is still unknown. Null for messages older than migration 0029.
+    uid = models.UUIDField(default=uuid.uuid4, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # One conversation in one direction, in id order (see chat.py)
+            models.Index(fields=["hostel", "sender", "receiver", "id"], name="chatmsg_conversation_idx"),
+        ]
 
     def __str__(self):
         return f"Chat from {self.sender.username} to {self.receiver.username}"
 
 
+class Conversation(models.Model):
+    """
+    One student's chat with a hostel owner about a hostel, for the inbox.
+
+    Rows are written by the ``hostel_owner_chatmessage_conversation`` trigger
+    (migration 0024) on every new ChatMessage: it upserts the conversation,
+    stores the latest message and bumps the receiver's unread counters, in the
+    same transaction as the insert. Reading resets one side's count.
+    """
+    PREVIEW_LENGTH = 200
+
+    hostel = models.ForeignKey("Hostel", on_delete=models.CASCADE, related_name="conversations")
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="owner_conversations")
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="student_conversations")
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message = models.TextField(blank=True, default="")
+    last_sender = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    owner_unread = models.PositiveIntegerField(default=0)
+    student_unread = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hostel", "student"], name="conversation_hostel_student_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "-last_message_at"], name="conversation_owner_inbox_idx"),
+            models.Index(fields=["student", "-last_message_at"], name="conversation_student_inbox_idx"),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.hostel_id}: owner {self.owner_id} / student {self.student_id}"
+
+
+# Partitioned by month on created_at (partitions.py); nothing may reference it by foreign key
 class OwnerNotification(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Newest-first listing and since_id delta sync (NotificationPagination)
+            models.Index(fields=["user", "created_at", "id"], name="ownernotif_user_created_idx"),
+            models.Index(fields=["user", "id"], name="ownernotif_user_id_idx"),
+            # Only unread rows, so marking everything read stays cheap as the table grows
+            models.Index(fields=["user"], condition=models.Q(is_read=False), name="ownernotif_user_unread_idx"),
+        ]
+
     def __str__(self):
         return f"Notification to {self.user.username}"
 
@@ -159,3 +323,21 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment for Booking {self.booking.id} - {self.status}"
+
+
+class ChannelGroupMembership(models.Model):
+    """ Group membership for PostgresChannelLayer (see channel_layers.py) """
+    group_name = models.CharField(max_length=100)
+    channel = models.CharField(max_length=100)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group_name", "channel"], name="channel_group_membership_unique"),
+        ]
+
+
+class ChannelLayerMessage(models.Model):
+    """ Channel layer payloads too large for a NOTIFY, sent by reference """
+    payload = models.TextField()
+    created_at = models.DateTimeField(db_index=True)
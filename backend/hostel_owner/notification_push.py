@@ -0,0 +1,70 @@
+"""
+Real-time delivery of notifications over ``ws/notifications/``.
+
+Every user has a channel group. Creating a ``student.Notification`` or an
+``OwnerNotification`` sends it to the recipient's group once the creating
+transaction commits (signals.py), and ``NotificationConsumer`` forwards it to
+the socket. Hostel owners receive ``OwnerNotification`` rows, everyone else
+``Notification`` rows, the same split as the REST endpoints.
+
+A reconnecting client passes ``?last_id=`` (the highest id it has seen) and
+first gets whatever it missed, oldest first, then live pushes.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from rest_framework import serializers
+
+from api.models import CustomUser
+from student.models import Notification
+from .models import OwnerNotification
+
+# Notifications replayed on reconnect; clients further behind refetch over REST.
+BACKLOG_LIMIT = 100
+
+_datetime = serializers.DateTimeField()
+
+
+def notification_group(user_id):
+    return f"notifications_{user_id}"
+
+
+def notification_model(user):
+    return OwnerNotification if user.role == CustomUser.HOSTEL_OWNER else Notification
+
+
+def notification_payload(notification):
+    """ The notification as pushed to the socket; same fields and formats as the REST lists """
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "is_read": notification.is_read,
+        "created_at": _datetime.to_representation(notification.created_at),
+    }
+
+
+def push_notification(notification):
+    """ Send a new notification to its user's sockets after the current transaction commits """
+    event = {
+        "type": "notification_push",
+        "model": notification._meta.label_lower,
+        "notification": notification_payload(notification),
+    }
+    group = notification_group(notification.user_id)
+
+    def send():
+        layer = get_channel_layer()
+        if layer is not None:
+            async_to_sync(layer.group_send)(group, event)
+
+    transaction.on_commit(send)
+
+
+def backlog(user, last_id, limit=BACKLOG_LIMIT):
+    """ Up to ``limit`` of the user's notifications newer than ``last_id``, oldest first, and whether more exist """
+    rows = list(
+        notification_model(user).objects.filter(user_id=user.id, id__gt=last_id)
+        .only("id", "message", "is_read", "created_at")
+        .order_by("id")[:limit + 1]
+    )
+    return [notification_payload(n) for n in rows[:limit]], len(rows) > limit
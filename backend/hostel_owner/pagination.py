@@ -0,0 +1,153 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the ordering key instead of using OFFSET.
+
+    The cursor is the opaque, url-safe encoding of the last row's ordering
+    values, so every page is one index range scan no matter how deep the
+    client has paged. The last ordering field must be unique (``id``) to keep
+    the order stable. Views may override ``keyset_ordering``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'HOSTEL_LIST_PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.seek(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def seek(self, position):
+        """
+        Rows strictly after ``position`` in the ordering.
+
+        Expands ``(a, b) < (x, y)`` into ``a <= x AND (a < x OR (a = x AND b < y))``;
+        the redundant leading bound lets Postgres start the index scan at the
+        cursor rather than filtering from the top.
+        """
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        after = Q()
+        for index, (name, descending) in enumerate(fields):
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": position[index]})
+            for prev_index, (prev_name, _) in enumerate(fields[:index]):
+                step &= Q(**{prev_name: position[prev_index]})
+            after |= step
+        lead, descending = fields[0]
+        return Q(**{f"{lead}__{'lte' if descending else 'gte'}": position[0]}) & after
+
+    def encode_cursor(self, row):
+        values = []
+        for name in self.ordering:
+            value = getattr(row, name.lstrip('-'))
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            position = json.loads(raw)
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # The cursor comes from the client: coerce each value to its field's type
+        values = []
+        for name, value in zip(self.ordering, position):
+            field = self.model._meta.get_field(name.lstrip('-'))
+            try:
+                value = field.to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class NotificationPagination(KeysetPagination):
+    """
+    Notification lists, newest first, with ``?since_id=`` delta sync.
+
+    A client that already holds notifications up to some id passes it as
+    ``since_id`` and only gets newer ones; when it is up to date the answer is
+    an empty page, found with one probe of the (user, id) index. ``?limit=``
+    sets the page size and ``next`` continues through older notifications.
+    """
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+    since_query_param = 'since_id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        since_id = request.query_params.get(self.since_query_param)
+        if since_id:
+            try:
+                queryset = queryset.filter(id__gt=int(since_id))
+            except ValueError:
+                raise ValidationError({self.since_query_param: 'Must be an integer'})
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,160 @@
+"""
+Monthly range partitioning for the append-only tables.
+
+``student_notification`` and ``hostel_owner_ownernotification`` are
+partitioned on ``created_at``, ``hostel_owner_chatmessage`` on ``timestamp``:
+one partition per calendar month (UTC) named ``<table>_pYYYYMM``, plus
+``<table>_default`` which takes rows outside every month so an insert never
+fails when ``maintain_partitions`` has not run in a while.
+
+The primary key becomes (id, <column>), since Postgres wants the partition
+key in every unique index. ids still come from one sequence per table, so
+Django keeps treating ``id`` as the pk. Nothing may hold a foreign key to
+these tables.
+
+``maintain_partitions`` (run it daily) creates the coming months, and
+retention (retention.py) drops whole months once they have expired.
+
+Queries bounded on the partition key (cursor pages of the newest-first
+notification lists, retention) only touch the partitions in range; lookups
+by user and id probe one small index per live partition, and retention keeps
+the number of live partitions bounded.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+from django.utils import timezone
+
+PARTITIONED_TABLES = {
+    "student_notification": "created_at",
+    "hostel_owner_ownernotification": "created_at",
+    "hostel_owner_chatmessage": "timestamp",
+}
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition(table):
+    return f"{table}_default"
+
+
+def monthly_partitions(cursor, table):
+    """ {month: partition name} for the table's attached monthly partitions """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        [table],
+    )
+    prefix = f"{table}_p"
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions[datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def create_partition(cursor, table, column, month):
+    """
+    Add the partition for ``month``. Rows of that month already sitting in the
+    default partition are moved into it first, otherwise ATTACH would refuse.
+    """
+    name = partition_name(table, month)
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(default_partition(table))} "
+        f"WHERE {qn(column)} >= %s AND {qn(column)} < %s RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        [lower, upper],
+    )
+    cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    return name
+
+
+def ensure_partitions(cursor, table, column, months_ahead):
+    """ Create the missing partitions from this month to ``months_ahead`` months on; returns their names """
+    existing = monthly_partitions(cursor, table)
+    current = month_start(timezone.now())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(cursor, table, column, month))
+    return created
+
+
+def convert_to_partitioned(schema_editor, table, column, months_ahead=3):
+    """
+    Rebuild an ordinary table as a monthly-partitioned one (used by migrations).
+
+    Rows, indexes, foreign keys and the id sequence carry over; triggers do
+    not and must be created again. Partitions are created from the month of
+    the oldest row to ``months_ahead`` months on.
+    """
+    old = f"{table}_unpartitioned"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [table],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min({qn(column)}), max(id) FROM {qn(table)}")
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(old)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn(column)})"
+        )
+        cursor.execute(f"CREATE TABLE {qn(default_partition(table))} PARTITION OF {qn(table)} DEFAULT")
+        month = month_start(oldest or timezone.now())
+        last = add_months(month_start(timezone.now()), months_ahead)
+        while month <= last:
+            create_partition(cursor, table, column, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(old)}")
+        # Frees the index, constraint and identity sequence names for the new table
+        cursor.execute(f"DROP TABLE {qn(old)}")
+
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} PRIMARY KEY (id, {qn(column)})")
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+        # Identity columns are not allowed on partitioned tables before Postgres 17
+        sequence = f"{table}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, (max_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+        cursor.execute(f"ANALYZE {qn(table)}")
+
+
+def refuse_to_unpartition(apps, schema_editor):
+    """ reverse_code for the partitioning migrations """
+    raise RuntimeError(
+        "The notification and chat tables cannot be turned back into plain tables by a migration. "
+        "Restore them from a dump taken before partitioning, then fake the migration backwards."
+    )
@@ -0,0 +1,109 @@
+"""
+Who is connected to chat, per process and across workers.
+
+Each process counts its own sockets per user. It also mirrors that count into
+a per-user counter in the cache alias ``settings.PRESENCE_CACHE_ALIAS`` (the
+shared cache when one is configured), so ``is_online(user_id)`` costs one
+local dict lookup, or one cache read when the user is not connected to this
+process.
+
+The shared counters have a TTL of ``PRESENCE_TTL_SECONDS``. Every process
+refreshes the counters of its users every ``PRESENCE_HEARTBEAT_SECONDS``, but
+only while their sockets show activity: a message, a ``ping`` frame, or the
+connect itself. So a worker that dies, or a socket that silently went away,
+drops out within one TTL.
+
+The functions touching the cache block; call them off the event loop.
+"""
+import asyncio
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+_sockets = Counter()
+_seen = {}
+_heartbeat = None
+
+
+def presence_cache():
+    return caches[settings.PRESENCE_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f"presence:{user_id}"
+
+
+def connect(user_id):
+    """ Register a new socket for the user; returns True if the user was offline everywhere before """
+    was_online = is_online(user_id)
+    _sockets[user_id] += 1
+    _seen[user_id] = time.monotonic()
+    cache = presence_cache()
+    cache.add(_key(user_id), 0, settings.PRESENCE_TTL_SECONDS)
+    try:
+        cache.incr(_key(user_id))
+    except ValueError:
+        cache.set(_key(user_id), _sockets[user_id], settings.PRESENCE_TTL_SECONDS)
+    cache.touch(_key(user_id), settings.PRESENCE_TTL_SECONDS)
+    return not was_online
+
+
+def disconnect(user_id):
+    """ Unregister a socket; returns True if the user has no sockets left anywhere """
+    _sockets[user_id] -= 1
+    if _sockets[user_id] <= 0:
+        del _sockets[user_id]
+        _seen.pop(user_id, None)
+    cache = presence_cache()
+    try:
+        if cache.decr(_key(user_id)) <= 0:
+            cache.delete(_key(user_id))
+    except ValueError:
+        pass
+    return not is_online(user_id)
+
+
+def seen(user_id):
+    """ Note activity on the user's socket (a message or a ping); no I/O """
+    if user_id in _sockets:
+        _seen[user_id] = time.monotonic()
+
+
+def is_online(user_id):
+    """ Whether the user has a chat socket open on any worker """
+    if _sockets[user_id] > 0:
+        return True
+    return (presence_cache().get(_key(user_id)) or 0) > 0
+
+
+def is_connected_here(user_id):
+    """ Whether the user has a chat socket open in this process; no I/O, safe on the event loop """
+    return _sockets[user_id] > 0
+
+
+def heartbeat():
+    """ Refresh the shared counters of this process's active users """
+    cache = presence_cache()
+    cutoff = time.monotonic() - settings.PRESENCE_TTL_SECONDS
+    for user_id, sockets in list(_sockets.items()):
+        if _seen.get(user_id, 0) < cutoff:
+            continue
+        if not cache.touch(_key(user_id), settings.PRESENCE_TTL_SECONDS):
+            # Expired meanwhile (e.g. the cache was flushed): restore this process's share.
+            cache.add(_key(user_id), sockets, settings.PRESENCE_TTL_SECONDS)
+
+
+async def _heartbeat_loop():
+    while _sockets:
+        await asyncio.sleep(settings.PRESENCE_HEARTBEAT_SECONDS)
+        await sync_to_async(heartbeat, thread_sensitive=False)()
+
+
+def ensure_heartbeat():
+    """ Start the heartbeat task on the running loop if it is not already running """
+    global _heartbeat
+    if _heartbeat is None or _heartbeat.done():
+        _heartbeat = asyncio.get_running_loop().create_task(_heartbeat_loop())
@@ -0,0 +1,97 @@
+"""
+Retention for the append-only notification and chat tables.
+
+Read notifications older than ``NOTIFICATION_RETENTION_DAYS`` are removed;
+chat messages only when ``CHAT_RETENTION_DAYS`` is set.
+
+Monthly partitions (partitions.py) that lie wholly before the cutoff and hold
+nothing to keep are dropped in one statement each. What is left (the month
+straddling the cutoff, months still holding unread notifications, the
+default partition) is deleted row by row: the deletes walk the table in id
+order, ``batch_size`` rows per transaction, so a run never holds long locks
+or builds one huge transaction. With ``archive`` the rows are copied to
+``<table>_archive`` first.
+
+Unread notifications are never removed, so the unread counters stay right.
+"""
+from django.db import connection, transaction
+
+from student.models import Notification
+
+from .models import ChatMessage, OwnerNotification
+from .partitions import add_months, monthly_partitions, qn
+
+RETENTION_BATCH_SIZE = 5000
+
+# model: (date column, only remove read rows)
+RETAINED_MODELS = {
+    Notification: ("created_at", True),
+    OwnerNotification: ("created_at", True),
+    ChatMessage: ("timestamp", False),
+}
+
+
+def archive_table(table):
+    return f"{table}_archive"
+
+
+def create_archive(cursor, table):
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {qn(archive_table(table))} (LIKE {qn(table)})")
+
+
+def expired(model, cutoff):
+    column, only_read = RETAINED_MODELS[model]
+    rows = model.objects.filter(**{f"{column}__lt": cutoff})
+    if only_read:
+        rows = rows.filter(is_read=True)
+    return rows
+
+
+def delete_expired(model, cutoff, archive=False, batch_size=RETENTION_BATCH_SIZE):
+    """ Remove the model's rows older than ``cutoff`` in id-ordered batches; returns how many went """
+    table = model._meta.db_table
+    rows = expired(model, cutoff).order_by("id")
+    last_id, deleted = 0, 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            ids = list(rows.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            if archive:
+                create_archive(cursor, table)
+                cursor.execute(
+                    f"WITH gone AS (DELETE FROM {qn(table)} WHERE id = ANY(%s) RETURNING *) "
+                    f"INSERT INTO {qn(archive_table(table))} SELECT * FROM gone",
+                    [ids],
+                )
+            else:
+                cursor.execute(f"DELETE FROM {qn(table)} WHERE id = ANY(%s)", [ids])
+            deleted += cursor.rowcount
+        last_id = ids[-1]
+
+
+def drop_expired_partitions(model, cutoff, archive=False):
+    """ Drop the model's monthly partitions that ended before ``cutoff`` and hold nothing to keep; returns their names """
+    table = model._meta.db_table
+    only_read = RETAINED_MODELS[model][1]
+    dropped = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for month, name in sorted(monthly_partitions(cursor, table).items()):
+            if add_months(month, 1) > cutoff:
+                break
+            if only_read:
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {qn(name)} WHERE NOT is_read)")
+                if cursor.fetchone()[0]:
+                    continue
+            if archive:
+                create_archive(cursor, table)
+                cursor.execute(f"INSERT INTO {qn(archive_table(table))} SELECT * FROM {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+            dropped.append(name)
+    return dropped
+
+
+def apply_retention(model, cutoff, archive=False, batch_size=RETENTION_BATCH_SIZE):
+    """ Remove the model's rows older than ``cutoff``; returns the dropped partitions and the rows deleted one by one """
+    dropped = drop_expired_partitions(model, cutoff, archive)
+    return dropped, delete_expired(model, cutoff, archive, batch_size)
@@ -0,0 +1,94 @@
+"""
+Hostel search: full-text matching, ranking and listing filters, all in SQL.
+
+``Hostel.search_vector`` is kept up to date by a trigger (migration 0017) and
+GIN-indexed, so ``?search=`` is an index lookup followed by ``ts_rank`` over
+the matching rows only.
+
+Amenity filters test ``Hostel.amenity_mask`` with one bitwise predicate, and
+``amenity_facets`` counts every amenity for a result set in one aggregate.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+from .models import AMENITY_FLAGS
+
+# Must match the config used by the search_vector trigger.
+SEARCH_CONFIG = 'english'
+
+
+def search_hostels(queryset, params):
+    """
+    Filter ``queryset`` by the listing query parameters.
+
+    ``search`` is a websearch-style query (quoted phrases, ``or``, ``-word``);
+    when given, matches are annotated with ``rank``. ``city`` is matched
+    case-insensitively. ``amenities`` is a comma separated list of
+    ``AMENITY_FLAGS`` that must all be set. ``min_price``/``max_price`` keep
+    hostels with at least one room in that price band and ``has_vacancy``
+    those with an available room; both read the maintained room aggregates.
+    """
+    city = params.get('city')
+    if city:
+        queryset = queryset.filter(city__iexact=city.strip())
+
+    min_price = _decimal_param(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(room_price_max__gte=min_price)
+    max_price = _decimal_param(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(room_price_min__lte=max_price)
+    if params.get('has_vacancy', '').lower() in ('1', 'true', 'yes'):
+        queryset = queryset.filter(available_rooms__gt=0)
+
+    amenities = [name.strip() for name in params.get('amenities', '').split(',') if name.strip()]
+    if amenities:
+        mask = amenity_mask(amenities)
+        queryset = queryset.alias(amenity_match=F('amenity_mask').bitand(mask)).filter(amenity_match=mask)
+
+    terms = params.get('search', '').strip()
+    if terms:
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        # ts_rank returns real; cast to double so the value round-trips
+        # exactly through the pagination cursor.
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
+    return queryset
+
+
+def _decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+
+
+def is_ranked(params):
+    """ Whether ``search_hostels`` annotated the queryset with ``rank`` """
+    return bool(params.get('search', '').strip())
+
+
+def amenity_mask(names):
+    """ Bitmask with the bit of every named amenity set """
+    unknown = set(names) - set(AMENITY_FLAGS)
+    if unknown:
+        raise ValidationError({'amenities': f"Unknown amenities: {', '.join(sorted(unknown))}"})
+    return sum(1 << AMENITY_FLAGS.index(name) for name in set(names))
+
+
+def amenity_facets(queryset):
+    """ Total and per-amenity hostel counts for ``queryset`` in a single aggregate query """
+    counts = queryset.aggregate(
+        total=Count('id'),
+        **{name: Count('id', filter=Q(**{name: True})) for name in AMENITY_FLAGS},
+    )
+    total = counts.pop('total')
+    return {'total': total, 'amenities': counts}
@@ -2,6 +2,69 @@ from rest_framework import serializers
 from .models import Hostel, HostelImage, Room, RoomImage, Booking, Feedback, Floor
 from api.models import CustomUser
 
+
+def _csv_param(request, name):
+    return {part.strip() for part in request.query_params.get(name, "").split(",") if part.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for GET requests.
+
+    ``?fields=a,b`` limits the output to those fields and ``?expand=x`` adds
+    fields listed in ``Meta.expandable_fields``, which are left out by default.
+    ``Meta.relations`` maps a field to the ``select_related``/``prefetch_related``
+    lookups it needs and, under ``only``, the columns it reads from the joined
+    rows (e.g. ``floor__hostel__name``); views pass their queryset through
+    ``optimize_queryset`` so only the columns and relations of the requested
+    shape are loaded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = self.requested_fields(self.context.get("request"))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        declared = list(cls.Meta.fields)
+        expandable = set(getattr(cls.Meta, "expandable_fields", ()))
+        if request is None or request.method != "GET":
+            return {name for name in declared if name not in expandable}
+
+        fields = _csv_param(request, "fields") & set(declared)
+        if not fields:
+            fields = {name for name in declared if name not in expandable}
+        return fields | (_csv_param(request, "expand") & expandable)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request, always=()):
+        """ Apply only()/select_related()/prefetch_related() for the requested shape """
+        requested = cls.requested_fields(request)
+        relations = getattr(cls.Meta, "relations", {})
+        columns = {"id", *always}
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+
+        for name in requested:
+            if name in concrete:
+                columns.add(name)
+            lookups = relations.get(name, {})
+            for path in lookups.get("select_related", ()):
+                queryset = queryset.select_related(path)
+                # the forward foreign key column has to be loaded to follow it
+                if path.split("__")[0] in concrete:
+                    columns.add(path.split("__")[0])
+            for path in lookups.get("prefetch_related", ()):
+                queryset = queryset.prefetch_related(path)
+            # without these the joined rows are loaded whole
+            columns.update(lookups.get("only", ()))
+
+        if request is not None and request.method == "GET":
+            queryset = queryset.only(*columns)
+        return queryset
+
 class HostelImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
 
@@ -20,41 +83,71 @@ class FloorSerializer(serializers.ModelSerializer):
         model = Floor
         fields = ['id', 'hostel', 'floor_number', 'description']
         
-class HostelSerializer(serializers.ModelSerializer):
+class HostelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = HostelImageSerializer(many=True, read_only=True)
     owner = serializers.ReadOnlyField(source="owner.username")
+    floors = FloorSerializer(many=True, read_only=True)
 
     class Meta:
         model = Hostel
         fields = [
             "id", "name", "address", "description", "owner",
             "contact_number", "email", "established_year",
-            "city", "state", "zip_code", "google_maps_link",
+            "city", "state", "zip_code", "google_maps_link", "latitude", "longitude",
             "wifi", "parking", "laundry", "security_guard", "mess_service",
             "attached_bathroom", "air_conditioning", "heater", "balcony",
             "rent_min", "rent_max", "security_deposit",
+            "room_price_min", "room_price_max", "total_rooms", "available_rooms",
             "smoking_allowed", "alcohol_allowed", "pets_allowed", "visiting_hours",
             "nearby_colleges", "nearby_markets", "created_at",
-            "images"
+            "images", "floors"
         ]
+        expandable_fields = ["floors"]
+        relations = {
+            "owner": {"select_related": ["owner"], "only": ["owner__username"]},
+            "images": {"prefetch_related": ["images"]},
+            "floors": {"prefetch_related": ["floors"]},
+        }
 
 class RoomImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = RoomImage
         fields = ["id", "image"]
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = RoomImageSerializer(many=True, read_only=True)
     floor = serializers.PrimaryKeyRelatedField(queryset=Floor.objects.all())
-    
+    hostel = serializers.SerializerMethodField()
+
+    def get_hostel(self, obj):
+        hostel = obj.floor.hostel
+        return {"id": hostel.id, "name": hostel.name}
 
     class Meta:
         model = Room
-        fields = ["id", "floor", "room_number", "room_type", "price", "is_available", "images"]
+        fields = ["id", "floor", "room_number", "room_type", "price", "is_available", "images", "hostel"]
+        expandable_fields = ["hostel"]
+        relations = {
+            "images": {"prefetch_related": ["images"]},
+            "hostel": {"select_related": ["floor__hostel"], "only": ["floor__hostel__name"]},
+        }
 
-class BookingSerializer(serializers.ModelSerializer):
+
+PAYMENT_COLUMNS = ["payment__amount", "payment__status", "payment__created_at"]
+
+
+def payment_summary(booking):
+    try:
+        payment = booking.payment
+    except Booking.payment.RelatedObjectDoesNotExist:
+        return None
+    return {"id": payment.id, "amount": payment.amount, "status": payment.status, "created_at": payment.created_at}
+
+
+class BookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student = serializers.SerializerMethodField()
     room = serializers.SerializerMethodField()
+    payment = serializers.SerializerMethodField()
 
     def get_student(self, obj):
         return {"id": obj.student.id, "username": obj.student.username, "email": obj.student.email} if obj.student else None
@@ -62,9 +155,18 @@ class BookingSerializer(serializers.ModelSerializer):
     def get_room(self, obj):
         return {"id": obj.room.id, "room_number": obj.room.room_number} if obj.room else None
 
+    def get_payment(self, obj):
+        return payment_summary(obj)
+
     class Meta:
         model = Booking
-        fields = ["id", "student", "room", "check_in", "check_out", "status", ]
+        fields = ["id", "student", "room", "check_in", "check_out", "status", "payment"]
+        expandable_fields = ["payment"]
+        relations = {
+            "student": {"select_related": ["student"], "only": ["student__username", "student__email"]},
+            "room": {"select_related": ["room"], "only": ["room__room_number"]},
+            "payment": {"select_related": ["payment"], "only": PAYMENT_COLUMNS},
+        }
 
 class FeedbackSerializer(serializers.ModelSerializer):
     student = serializers.SerializerMethodField()
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from student.models import Notification
+from .cache import invalidate_hostel
+from .models import Floor, Hostel, HostelImage, OwnerNotification, Room, RoomImage
+from .notification_push import push_notification
+from .unread import adjust_unread
+from .stats import refresh_room_stats
+
+
+@receiver(post_init, sender=Notification)
+@receiver(post_init, sender=OwnerNotification)
+def remember_notification_read(sender, instance, **kwargs):
+    if not instance.pk:
+        instance._loaded_is_read = True
+    elif "is_read" in instance.get_deferred_fields():
+        instance._loaded_is_read = None  # unknown; saving such an instance leaves the count alone
+    else:
+        instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=OwnerNotification)
+def notification_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        push_notification(instance)
+    # Unsaved instances count as read, so a new unread row adds one
+    if instance._loaded_is_read is not None and "is_read" not in instance.get_deferred_fields():
+        adjust_unread(sender, instance.user_id, int(instance._loaded_is_read) - int(instance.is_read))
+        instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=OwnerNotification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread(sender, instance.user_id, -1)
+
+
+@receiver(post_init, sender=Room)
+def remember_room_floor(sender, instance, **kwargs):
+    instance._loaded_floor_id = instance.floor_id
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    floor_ids = {instance.floor_id, instance._loaded_floor_id} - {None}
+    # refresh_room_stats also bumps the hostels' version
+    refresh_room_stats(Hostel.objects.filter(floors__in=floor_ids))
+    for hostel_id in Floor.objects.filter(id__in=floor_ids).values_list("hostel_id", flat=True):
+        invalidate_on_commit(hostel_id)
+    instance._loaded_floor_id = instance.floor_id
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    refresh_room_stats(Hostel.objects.filter(floors=instance.floor_id))
+    invalidate_on_commit(Floor.objects.filter(id=instance.floor_id).values_list("hostel_id", flat=True).first())
+
+
+@receiver([post_save, post_delete], sender=Hostel)
+def hostel_saved_or_deleted(sender, instance, raw=False, **kwargs):
+    # Hostel.save() already bumped the version
+    if not raw:
+        invalidate_on_commit(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Floor)
+@receiver([post_save, post_delete], sender=HostelImage)
+def hostel_child_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        hostel_changed(instance.hostel_id)
+
+
+@receiver([post_save, post_delete], sender=RoomImage)
+def room_image_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        hostel_changed(Room.objects.filter(id=instance.room_id).values_list("floor__hostel_id", flat=True).first())
+
+
+def hostel_changed(hostel_id):
+    """ Bump the hostel's version and drop its cached responses """
+    if hostel_id is not None:
+        Hostel.objects.filter(pk=hostel_id).update(version=F("version") + 1, updated_at=timezone.now())
+    invalidate_on_commit(hostel_id)
+
+
+def invalidate_on_commit(hostel_id):
+    """ Invalidate cached responses for the hostel once the current transaction commits """
+    transaction.on_commit(lambda: invalidate_hostel(hostel_id))
@@ -0,0 +1,37 @@
+"""
+Per-hostel room aggregates (price range, room and vacancy counts).
+
+They are denormalized onto ``Hostel`` so listings can filter and sort on them
+through the hostel's own indexes instead of joining Hostel -> Floor -> Room.
+"""
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Room
+
+
+def _per_hostel(aggregate, output_field=None):
+    rooms = (
+        Room.objects.filter(floor__hostel=OuterRef('pk'))
+        .order_by()
+        .values('floor__hostel')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Subquery(rooms, output_field=output_field)
+
+
+def refresh_room_stats(hostels):
+    """
+    Recompute the aggregates of every hostel in the ``hostels`` queryset with
+    one UPDATE, which also bumps their version for conditional GETs.
+    """
+    return hostels.update(
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+        room_price_min=_per_hostel(Min('price')),
+        room_price_max=_per_hostel(Max('price')),
+        total_rooms=Coalesce(_per_hostel(Count('id'), IntegerField()), 0),
+        available_rooms=Coalesce(_per_hostel(Count('id', filter=Q(is_available=True)), IntegerField()), 0),
+    )
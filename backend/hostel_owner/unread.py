@@ -0,0 +1,48 @@
+"""
+Unread notification counters kept on the user row.
+
+``CustomUser.unread_notifications`` counts unread ``student.Notification``
+rows, ``CustomUser.unread_owner_notifications`` unread ``OwnerNotification``
+rows, so a badge is read straight off ``request.user``. Creating, deleting or
+saving a single notification adjusts the count through signals (signals.py);
+bulk marking goes through ``mark_read``, which counts the rows it flipped.
+"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from api.models import CustomUser
+from student.models import Notification
+from .models import OwnerNotification
+
+UNREAD_FIELDS = {
+    Notification: "unread_notifications",
+    OwnerNotification: "unread_owner_notifications",
+}
+
+
+def adjust_unread(model, user_id, delta):
+    if delta:
+        field = UNREAD_FIELDS[model]
+        CustomUser.objects.filter(id=user_id).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def mark_read(model, user_id, **filters):
+    """ Mark the user's unread notifications matching ``filters`` as read; returns how many changed """
+    changed = model.objects.filter(user_id=user_id, is_read=False, **filters).update(is_read=True)
+    adjust_unread(model, user_id, -changed)
+    return changed
+
+
+def mark_all_read(model, user):
+    """ Mark all of the user's notifications read; skips the UPDATE when the counter says there is nothing to do """
+    if not getattr(user, UNREAD_FIELDS[model]):
+        return 0
+    return mark_read(model, user.id)
+
+
+def unread_counts(user):
+    """ Badge counts for the user, without touching the notification tables """
+    return {
+        "unread": getattr(user, UNREAD_FIELDS[OwnerNotification if user.role == CustomUser.HOSTEL_OWNER else Notification]),
+        "unread_messages": user.unread_messages,
+    }
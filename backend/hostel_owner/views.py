@@ -3,7 +3,7 @@ from io import BytesIO
 import logging
 import pandas as pd
 
-from django.core.mail import send_mail
+from api.email_outbox import queue_email
 from django.conf import settings
 from django.db.models import Count, Avg, Sum
 from django.http import HttpResponse
@@ -13,7 +13,7 @@ from django.utils.timezone import now
 from django.utils import timezone
 from django.views.decorators.cache import never_cache
 
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, permissions, status, generics, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
@@ -27,31 +27,28 @@ from .serializers import (
     HostelSerializer, RoomSerializer, BookingSerializer, FeedbackSerializer,
     HostelImageSerializer, FloorSerializer, RoomImageSerializer, OwnerNotificationSerializer
 )
+from .conditional import hostel_condition, room_condition
 from rest_framework.permissions import IsAuthenticated
 logger = logging.getLogger(__name__)
 
 
 def send_booking_email(booking, status):
-    """  Send email to student when booking is confirmed/rejected  """
+    """  Queue email to student when booking is confirmed/rejected  """
     try:
         recipient_email = booking.student.email
 
         logger.info(f"📧 Attempting to send email to {recipient_email} - Status: {status}")
-        print(f"📧 Attempting to send email to {recipient_email} - Status: {status}")  
         subject = f"Your Booking has been {status}"
         message = f"Hello {booking.student.username},\n\n" \
                   f"Your booking for {booking.room.floor.hostel.name} has been {status}.\n" \
                   f"Check-in: {booking.check_in}\nCheck-out: {booking.check_out}\n" \
                   f"Thank you for using SajiloFinder!"
 
-        send_mail(subject, message, settings.EMAIL_HOST_USER, [recipient_email], fail_silently=False)
-
-        logger.info(f" Booking email successfully sent to {recipient_email} - Status: {status}")
-        print(f" Booking email successfully sent to {recipient_email} - Status: {status}")  
+        queue_email(subject, message, [recipient_email])
 
+        logger.info(f" Booking email queued for {recipient_email} - Status: {status}")
     except Exception as e:
-        logger.error(f" Error sending booking email to {recipient_email}: {str(e)}")
-        print(f" Error sending booking email to {recipient_email}: {str(e)}")  
+        logger.error(f" Error queueing booking email to {recipient_email}: {str(e)}")
 
 
 class IsHostelOwner(permissions.BasePermission):
@@ -141,6 +138,14 @@ class HostelViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser, JSONParser)
 
+    def get_queryset(self):
+        return HostelSerializer.optimize_queryset(Hostel.objects.defer("search_vector"), self.request)
+
+    @method_decorator(hostel_condition)
+    def retrieve(self, request, *args, **kwargs):
+        key = detail_cache_key(request, kwargs["pk"])
+        return cached_response(key, lambda: super(HostelViewSet, self).retrieve(request, *args, **kwargs))
+
     def perform_create(self, serializer):
         images = self.request.FILES.getlist('images')
         hostel = serializer.save(owner=self.request.user)
@@ -242,7 +247,6 @@ from io import BytesIO
 import logging
 import pandas as pd
 
-from django.core.mail import send_mail
 from django.conf import settings
 from django.db.models import Count, Avg, Sum
 from django.http import HttpResponse
@@ -252,7 +256,7 @@ from django.utils.timezone import now
 from django.utils import timezone
 from django.views.decorators.cache import never_cache
 
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, permissions, status, generics, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
@@ -266,6 +270,15 @@ from .serializers import (
     HostelSerializer, RoomSerializer, BookingSerializer, FeedbackSerializer,
     HostelImageSerializer, FloorSerializer, RoomImageSerializer, OwnerNotificationSerializer
 )
+from .availability import RoomUnavailable, free_rooms, is_room_free, parse_stay, update_booking
+from .pagination import KeysetPagination, NotificationPagination
+from .stats import refresh_room_stats
+from .cache import cache_stats, cached_response, detail_cache_key, list_cache_key
+from .signals import invalidate_on_commit
+from .chat import conversation_messages, inbox, mark_conversation_read
+from .chat_limits import chat_stats
+from .unread import mark_all_read, mark_read, unread_counts
+from django.db import transaction
 from rest_framework.permissions import IsAuthenticated
 logger = logging.getLogger(__name__)
 class RoomViewSet(viewsets.ModelViewSet):
@@ -273,7 +286,7 @@ class RoomViewSet(viewsets.ModelViewSet):
     serializer_class = RoomSerializer
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     def get_queryset(self):
-        queryset = Room.objects.all()
+        queryset = RoomSerializer.optimize_queryset(Room.objects.all(), self.request)
         floor_id = self.request.query_params.get('floor_id')
         hostel_id = self.request.query_params.get('hostel_id')
 
@@ -284,6 +297,10 @@ class RoomViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @method_decorator(room_condition)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         images = self.request.FILES.getlist('images')
         floor_id = self.request.data.get('floor')
@@ -312,6 +329,33 @@ class RoomViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_200_OK)
         except Room.DoesNotExist:
             return Response({"error": "Room not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['get'], url_path='available')
+    def available(self, request):
+        """  Rooms free for the whole stay, optionally scoped by hostel_id / floor_id  """
+        try:
+            check_in, check_out = parse_stay(request.query_params.get('check_in'), request.query_params.get('check_out'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rooms = free_rooms(check_in, check_out, self.get_queryset()).order_by('floor_id', 'room_number')
+        return Response(self.get_serializer(rooms, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='availability')
+    def availability(self, request, pk=None):
+        """  Is this room free between check_in and check_out?  """
+        room = self.get_object()
+        try:
+            check_in, check_out = parse_stay(request.query_params.get('check_in'), request.query_params.get('check_out'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "room": room.id,
+            "check_in": check_in,
+            "check_out": check_out,
+            "available": is_room_free(room, check_in, check_out),
+        }, status=status.HTTP_200_OK)
         
     @action(detail=False, methods=['post'], url_path='bulk_add')
     def bulk_add_rooms(self, request):
@@ -330,8 +374,9 @@ class RoomViewSet(viewsets.ModelViewSet):
         if not isinstance(rooms_data, list) or len(rooms_data) == 0:
             return Response({"error": "rooms must be a list of room details"}, status=status.HTTP_400_BAD_REQUEST)
 
-        added_rooms = []
+        new_rooms = []
         errors = []
+        existing_numbers = set(Room.objects.filter(floor=floor).values_list("room_number", flat=True))
 
         for room_data in rooms_data:
             room_number = room_data.get("room_number")
@@ -342,18 +387,24 @@ class RoomViewSet(viewsets.ModelViewSet):
                 errors.append({"error": "Missing required fields", "room_data": room_data})
                 continue  # Skip invalid room entry
 
-            if Room.objects.filter(floor=floor, room_number=room_number).exists():
+            if room_number in existing_numbers:
                 errors.append({"error": f"Room {room_number} already exists in this floor"})
                 continue  # Skip duplicate room entry
 
-            # Create the room
-            room = Room.objects.create(
+            existing_numbers.add(room_number)
+            new_rooms.append(Room(
                 floor=floor,
                 room_number=room_number,
                 room_type=room_type,
                 price=price
-            )
-            added_rooms.append(RoomSerializer(room).data)
+            ))
+
+        # One INSERT and one hostel stats refresh instead of a save() signal per room
+        with transaction.atomic():
+            created = Room.objects.bulk_create(new_rooms)
+            refresh_room_stats(Hostel.objects.filter(pk=floor.hostel_id))
+            invalidate_on_commit(floor.hostel_id)
+        added_rooms = RoomSerializer(created, many=True).data
 
         if errors:
             return Response({"message": "Some rooms could not be added", "added_rooms": added_rooms, "errors": errors}, 
@@ -392,10 +443,21 @@ class BookingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'HostelOwner':
-            return Booking.objects.filter(room__floor__hostel__owner=user)
+            bookings = Booking.objects.filter(room__floor__hostel__owner=user)
         elif user.role == 'Student':
-            return Booking.objects.filter(student=user)
-        return Booking.objects.none()
+            bookings = Booking.objects.filter(student=user)
+        else:
+            return Booking.objects.none()
+        return BookingSerializer.optimize_queryset(bookings, self.request)
+
+    def perform_update(self, serializer):
+        """  Date changes go through the same availability check as new bookings  """
+        try:
+            update_booking(serializer)
+        except ValueError as e:
+            raise serializers.ValidationError({"check_out": str(e)})
+        except RoomUnavailable as e:
+            raise serializers.ValidationError({"room_id": str(e)})
 
     @action(detail=True, methods=['patch'])
     def approve(self, request, pk=None):
@@ -533,9 +595,32 @@ def submit_feedback(request):
     return Response({'message': 'Feedback submitted'}, status=status.HTTP_201_CREATED)
 
 class AvailableHostelsView(generics.ListAPIView):
-    queryset = Hostel.objects.all()
     serializer_class = HostelSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        # created_at is the pagination key, load it whatever ?fields= asks for
+        return HostelSerializer.optimize_queryset(Hostel.objects.defer("search_vector"), self.request, always=("created_at",))
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(list_cache_key(request), lambda: super(AvailableHostelsView, self).list(request, *args, **kwargs))
+
+
+class HostelCacheStatsView(APIView):
+    """  Hit/miss counters of the hostel response cache in this worker  """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class ChatStatsView(APIView):
+    """  Throttled, oversized and dropped chat frames in this worker  """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(chat_stats())
 
 class FloorViewSet(viewsets.ModelViewSet):
     queryset = Floor.objects.all()
@@ -835,22 +920,52 @@ class DownloadReportView(APIView):
 
 class ChatHistoryView(APIView):
     """
-    API to fetch chat history between a student and hostel owner.
+    Chat history between the requesting user and their counterpart about a hostel.
+
+    Students always talk to the hostel owner; the owner names the student with
+    ?counterpart=<user id>. ?before=<message id> pages back through older
+    messages and ?after=<message id> fetches newer ones; ?limit= caps the page
+    (default 50, max 200). Messages are returned oldest first.
     """
     permission_classes = [IsAuthenticated]
+    default_limit = 50
+    max_limit = 200
 
     def get(self, request, hostel_id):
         user = request.user
+        hostel = get_object_or_404(
+            Hostel.objects.select_related("owner").only("id", "owner__id", "owner__username"), id=hostel_id
+        )
 
-        # Get chat messages related to the hostel
-        messages = ChatMessage.objects.filter(hostel_id=hostel_id).order_by("timestamp")
+        try:
+            before = int(request.query_params["before"]) if "before" in request.query_params else None
+            after = int(request.query_params["after"]) if "after" in request.query_params else None
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "before, after and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit <= 0:
+            return Response({"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if user.id == hostel.owner_id:
+            counterpart_id = request.query_params.get("counterpart")
+            if not counterpart_id:
+                return Response({"error": "counterpart is required"}, status=status.HTTP_400_BAD_REQUEST)
+            counterpart = get_object_or_404(CustomUser.objects.only("id", "username"), id=counterpart_id)
+        else:
+            counterpart = hostel.owner
+
+        usernames = {user.id: user.username, counterpart.id: counterpart.username}
+        messages = conversation_messages(hostel.id, user.id, counterpart.id, before=before, after=after, limit=limit)
 
         chat_data = [
             {
-                "sender": message.sender.username,
-                "receiver": message.receiver.username,
-                "message": message.message,
-                "timestamp": message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "id": message["id"],
+                "sender_id": message["sender_id"],
+                "receiver_id": message["receiver_id"],
+                "sender": usernames[message["sender_id"]],
+                "receiver": usernames[message["receiver_id"]],
+                "message": message["message"],
+                "timestamp": message["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
             }
             for message in messages
         ]
@@ -858,32 +973,46 @@ class ChatHistoryView(APIView):
         return Response(chat_data)
 
 
-from django.core.mail import send_mail
-from django.conf import settings
-import logging
+class ConversationListView(APIView):
+    """
+    The user's chat inbox: one entry per conversation across all their hostels,
+    latest first, with the last message and their unread count. One query.
+    """
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        user = request.user
+        conversations = inbox(user)
+        hostel_id = request.query_params.get("hostel")
+        if hostel_id:
+            conversations = conversations.filter(hostel_id=hostel_id)
+
+        data = []
+        for conversation in conversations:
+            is_owner = conversation.owner_id == user.id
+            counterpart = conversation.student if is_owner else conversation.owner
+            data.append({
+                "id": conversation.id,
+                "hostel_id": conversation.hostel_id,
+                "hostel_name": conversation.hostel.name,
+                "counterpart_id": counterpart.id,
+                "counterpart": counterpart.username,
+                "last_message_id": conversation.last_message_id,
+                "last_message": conversation.last_message,
+                "last_sender_id": conversation.last_sender_id,
+                "last_message_at": conversation.last_message_at.strftime("%Y-%m-%d %H:%M:%S") if conversation.last_message_at else None,
+                "unread": conversation.owner_unread if is_owner else conversation.student_unread,
+            })
+        return Response(data)
 
 
-def send_chat_email_notification(sender, receiver, message):
-    """  Send email to notify users of new chat messages """
-    try:
-        recipient_email = receiver.email  
-        logger.info(f" Sending chat notification email to {recipient_email}")
-        print(f" Sending chat notification email to {recipient_email}")  
-        subject = f"New Message from {sender.username}"
-        message_body = f"Hello {receiver.username},\n\n" \
-                       f"You have received a new message from {sender.username}:\n\n" \
-                       f'"{message}"\n\n' \
-                       f"Log in to SajiloFinder to continue the conversation.\n\n" \
-                       f"Thank you!"
-
-        send_mail(subject, message_body, settings.EMAIL_HOST_USER, [recipient_email], fail_silently=False)
-
-        logger.info(f" Chat notification email sent to {recipient_email}")
-        print(f" Chat notification email sent to {recipient_email}")  
-    except Exception as e:
-        logger.error(f" Error sending chat notification email to {recipient_email}: {str(e)}")
-        print(f" Error sending chat notification email to {recipient_email}: {str(e)}")  
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_conversation_as_read(request, conversation_id):
+    conversation = mark_conversation_read(conversation_id, request.user)
+    if conversation is None:
+        return Response({"error": "Conversation not found"}, status=404)
+    return Response({"message": "Conversation marked as read"}, status=200)
 
 
 def notify_student_on_reply(feedback):
@@ -896,9 +1025,11 @@ class OwnerNotificationListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        notifications = OwnerNotification.objects.filter(user=request.user).order_by("-created_at")
-        serializer = OwnerNotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        """  ?since_id= and ?limit=/cursor paging, see NotificationPagination  """
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(OwnerNotification.objects.filter(user=request.user), request, view=self)
+        serializer = OwnerNotificationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 
@@ -908,17 +1039,22 @@ from hostel_owner.models import OwnerNotification
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
 def mark_notification_as_read(request, notification_id):
-    try:
-        notif = OwnerNotification.objects.get(id=notification_id, user=request.user)
-        notif.is_read = True
-        notif.save()
-        return Response({"message": "Notification marked as read"}, status=200)
-    except OwnerNotification.DoesNotExist:
-        return Response({"error": "Notification not found"}, status=404)
+    # Conditional update, so concurrent requests cannot both decrement the counter
+    if not mark_read(OwnerNotification, request.user.id, id=notification_id):
+        if not OwnerNotification.objects.filter(id=notification_id, user=request.user).exists():
+            return Response({"error": "Notification not found"}, status=404)
+    return Response({"message": "Notification marked as read"}, status=200)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_all_notifications_as_read(request):
-    OwnerNotification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    mark_all_read(OwnerNotification, request.user)
     return Response({"message": "All notifications marked as read"}, status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def owner_unread_count(request):
+    """  Notification badge count, read from the user row  """
+    return Response(unread_counts(request.user))
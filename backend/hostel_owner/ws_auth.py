@@ -0,0 +1,32 @@
+"""
+JWT authentication for WebSocket connections.
+
+Browsers cannot set an Authorization header on a WebSocket handshake, so the
+access token is passed as ``?token=<access token>`` and validated with the
+same SimpleJWT settings as the REST API. ``scope["user"]`` is the token's
+user, or ``AnonymousUser`` when the token is missing, invalid or expired.
+"""
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        tokens = parse_qs(scope.get("query_string", b"").decode()).get("token")
+        scope["user"] = await get_user_for_token(tokens[0]) if tokens else AnonymousUser()
+        return await super().__call__(scope, receive, send)
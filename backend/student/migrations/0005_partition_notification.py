@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from hostel_owner.partitions import convert_to_partitioned, refuse_to_unpartition
+
+
+def partition_notifications(apps, schema_editor):
+    convert_to_partitioned(schema_editor, "student_notification", "created_at")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0004_notification_user_unread_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_notifications, refuse_to_unpartition),
+    ]
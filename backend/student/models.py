@@ -16,11 +16,21 @@ class StudentProfile(models.Model):
 from django.db import models
 from api.models import CustomUser
 
+# Partitioned by month on created_at (hostel_owner/partitions.py); nothing may reference it by foreign key
 class Notification(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='student_notifications')
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Newest-first listing and since_id delta sync (NotificationPagination)
+            models.Index(fields=["user", "created_at", "id"], name="notif_user_created_idx"),
+            models.Index(fields=["user", "id"], name="notif_user_id_idx"),
+            # Only unread rows, so marking everything read stays cheap as the table grows
+            models.Index(fields=["user"], condition=models.Q(is_read=False), name="notif_user_unread_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.message}"
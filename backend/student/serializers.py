@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from hostel_owner.models import Booking, Room, Hostel, Feedback
+from hostel_owner.serializers import PAYMENT_COLUMNS, DynamicFieldsMixin, HostelImageSerializer, payment_summary
 from .models import StudentProfile
 
 class StudentProfileSerializer(serializers.ModelSerializer):
@@ -7,9 +8,10 @@ class StudentProfileSerializer(serializers.ModelSerializer):
         model = StudentProfile
         fields = '__all__'
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student = serializers.SerializerMethodField()
     room = serializers.SerializerMethodField()
+    payment = serializers.SerializerMethodField()
 
     def get_student(self, obj):
         return {
@@ -31,15 +33,41 @@ class BookingSerializer(serializers.ModelSerializer):
             }
         }
 
+    def get_payment(self, obj):
+        return payment_summary(obj)
+
     class Meta:
         model = Booking
-        fields = ["id", "student", "room", "check_in", "check_out", "status", "created_at"]
+        fields = ["id", "student", "room", "check_in", "check_out", "status", "created_at", "payment"]
+        expandable_fields = ["payment"]
+        relations = {
+            "student": {"select_related": ["student"], "only": ["student__username", "student__email"]},
+            "room": {"select_related": ["room__floor__hostel"], "only": ["room__room_number", "room__floor__hostel__name"]},
+            "payment": {"select_related": ["payment"], "only": PAYMENT_COLUMNS},
+        }
+
 
+class HostelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    images = HostelImageSerializer(many=True, read_only=True)
 
-class HostelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hostel
-        fields = '__all__'
+        fields = [
+            "id", "owner", "name", "address", "description",
+            "contact_number", "email", "established_year",
+            "city", "state", "zip_code", "google_maps_link", "latitude", "longitude",
+            "wifi", "parking", "laundry", "security_guard", "mess_service",
+            "attached_bathroom", "air_conditioning", "heater", "balcony",
+            "rent_min", "rent_max", "security_deposit",
+            "room_price_min", "room_price_max", "total_rooms", "available_rooms",
+            "smoking_allowed", "alcohol_allowed", "pets_allowed", "visiting_hours",
+            "nearby_colleges", "nearby_markets", "created_at", "updated_at",
+            "cancellation_policy", "images"
+        ]
+        expandable_fields = ["images"]
+        relations = {
+            "images": {"prefetch_related": ["images"]},
+        }
 
 class FeedbackSerializer(serializers.ModelSerializer):
     class Meta:
@@ -2,6 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     HostelSearchView, 
+    HostelFacetView,
+    HostelNearbyView,
     StudentBookingHistoryView, 
     CancelBookingView, 
     StudentProfileView,
@@ -9,13 +11,15 @@ from .views import (
     BookingViewSet,
     submit_feedback,get_student_notifications
 )
-from .views import mark_all_notifications_read
+from .views import mark_all_notifications_read, notification_unread_count
 
 router = DefaultRouter()
 router.register(r'bookings', BookingViewSet)
 
 urlpatterns = [
     path("hostels/search/", HostelSearchView.as_view(), name="hostel-search"),
+    path("hostels/facets/", HostelFacetView.as_view(), name="hostel-facets"),
+    path("hostels/nearby/", HostelNearbyView.as_view(), name="hostel-nearby"),
     path("bookings/manual/", BookHostelView.as_view(), name="book-hostel-manual"),  # 👈 changed
     path("bookings/<int:booking_id>/cancel/", CancelBookingView.as_view(), name="cancel-booking"),
     path("bookings/my-history/", StudentBookingHistoryView.as_view(), name="booking-history"),
@@ -23,6 +27,7 @@ urlpatterns = [
     path("feedback/", submit_feedback, name="submit-feedback"),
     path('notifications/', get_student_notifications, name='student-notifications'),
     path("notifications/mark_all_read/", mark_all_notifications_read, name="mark-all-notifications-read"),
+    path("notifications/unread_count/", notification_unread_count, name="notification-unread-count"),
 
     path('', include(router.urls)),  
 ]
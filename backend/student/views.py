@@ -7,11 +7,55 @@ from hostel_owner.models import Booking, Room, Hostel
 from .models import StudentProfile
 from .serializers import StudentProfileSerializer, BookingSerializer, HostelSerializer
 from rest_framework import serializers
+from hostel_owner.pagination import KeysetPagination, NotificationPagination
+from hostel_owner.search import amenity_facets, is_ranked, search_hostels
+from hostel_owner.geo import nearby
 #  Search & Filter Hostels
 class HostelSearchView(ListAPIView):
-    queryset = Hostel.objects.all()
+    """  ?search= full-text query ranked by relevance, plus ?city= and ?amenities= filters  """
     serializer_class = HostelSerializer
-    search_fields = ['location', 'name', 'address', 'description']
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        if is_ranked(params):
+            self.keyset_ordering = ('-rank', '-id')
+        hostels = HostelSerializer.optimize_queryset(Hostel.objects.defer("search_vector"), self.request, always=("created_at",))
+        return search_hostels(hostels, params)
+
+
+class HostelNearbyView(ListAPIView):
+    """  Hostels within ?radius_km= of ?lat=&lng=, nearest first, at most ?limit=  """
+    serializer_class = HostelSerializer
+    max_radius_km = 50
+    max_limit = 100
+
+    def list(self, request, *args, **kwargs):
+        try:
+            lat = float(request.query_params["lat"])
+            lng = float(request.query_params["lng"])
+            radius_km = min(float(request.query_params.get("radius_km", 5)), self.max_radius_km)
+            limit = min(int(request.query_params.get("limit", 20)), self.max_limit)
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required numbers; radius_km and limit must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius_km <= 0 or limit <= 0:
+            return Response({"error": "Coordinates out of range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        hostels = HostelSerializer.optimize_queryset(Hostel.objects.defer("search_vector"), request)
+        hostels = list(nearby(search_hostels(hostels, request.query_params), lat, lng, radius_km)[:limit])
+        data = self.get_serializer(hostels, many=True).data
+        for item, hostel in zip(data, hostels):
+            item["distance_km"] = round(hostel.distance_km, 3)
+        return Response(data)
+
+
+class HostelFacetView(APIView):
+    """  Amenity counts for the hostels matching the same filters as HostelSearchView  """
+
+    def get(self, request):
+        hostels = search_hostels(Hostel.objects.defer("search_vector"), request.query_params)
+        return Response(amenity_facets(hostels))
 
 from rest_framework.permissions import IsAuthenticated
 
@@ -20,6 +64,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from hostel_owner.models import Room, Booking  #  Import from hostel_owner instead of student
+from hostel_owner.availability import RoomUnavailable, parse_stay, reserve, update_booking
+from hostel_owner.unread import mark_all_read, unread_counts
 
 from .serializers import BookingSerializer
 
@@ -41,25 +87,28 @@ class BookHostelView(APIView):
             return Response({"error": "room_id, check_in, and check_out are required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            room = Room.objects.get(id=room_id)
+            check_in, check_out = parse_stay(check_in, check_out)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            if not room.is_available:
-                return Response({"error": "Room is not available"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            room = Room.objects.get(id=room_id)
 
             #  Correctly assign the student when creating a booking
-            booking = Booking.objects.create(
+            booking = reserve(room, check_in, check_out, lambda: Booking.objects.create(
                 student=request.user,  
                 room=room,
                 check_in=check_in,
                 check_out=check_out,
                 status='pending'
-            )
+            ))
 
-            print(" Booking created:", booking)
             return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
 
         except Room.DoesNotExist:
             return Response({"error": "Room not found"}, status=status.HTTP_404_NOT_FOUND)
+        except RoomUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 
@@ -87,14 +136,13 @@ from rest_framework.response import Response
 from rest_framework import status
 from hostel_owner.models import Booking
 from student.serializers import BookingSerializer
-from django.core.mail import send_mail
+from api.email_outbox import queue_email
 from django.conf import settings
 import logging
 
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.core.mail import send_mail
 from django.conf import settings
 import logging
 from hostel_owner.models import Booking, Room
@@ -115,6 +163,9 @@ class BookingViewSet(viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return BookingSerializer.optimize_queryset(Booking.objects.all(), self.request)
+
     def perform_create(self, serializer):
         """  Ensure room exists before booking """
         room_id = self.request.data.get("room_id")
@@ -127,7 +178,24 @@ class BookingViewSet(viewsets.ModelViewSet):
         except Room.DoesNotExist:
             raise serializers.ValidationError({"room_id": "Invalid room ID."})
 
-        serializer.save(student=self.request.user, room=room)
+        check_in = serializer.validated_data["check_in"]
+        check_out = serializer.validated_data["check_out"]
+        if check_out <= check_in:
+            raise serializers.ValidationError({"check_out": "check_out must be after check_in."})
+
+        try:
+            reserve(room, check_in, check_out, lambda: serializer.save(student=self.request.user, room=room))
+        except RoomUnavailable as e:
+            raise serializers.ValidationError({"room_id": str(e)})
+
+    def perform_update(self, serializer):
+        """  Date changes go through the same availability check as new bookings  """
+        try:
+            update_booking(serializer)
+        except ValueError as e:
+            raise serializers.ValidationError({"check_out": str(e)})
+        except RoomUnavailable as e:
+            raise serializers.ValidationError({"room_id": str(e)})
 
     @action(detail=True, methods=['patch'])
     def approve(self, request, pk=None):
@@ -170,12 +238,11 @@ class BookingViewSet(viewsets.ModelViewSet):
             return Response({"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND)
 
     def send_booking_email(self, booking, status):
-        """  Send email to student when booking is confirmed/rejected  """
+        """  Queue email to student when booking is confirmed/rejected  """
         try:
             recipient_email = booking.student.email
 
             logger.info(f" Attempting to send email to {recipient_email} - Status: {status}")
-            print(f" Attempting to send email to {recipient_email} - Status: {status}")  #  Debugging Output
 
             subject = f"Your Booking has been {status}"
             message = f"Hello {booking.student.username},\n\n" \
@@ -183,14 +250,12 @@ class BookingViewSet(viewsets.ModelViewSet):
                       f"Check-in: {booking.check_in}\nCheck-out: {booking.check_out}\n" \
                       f"Thank you for using SajiloFinder!"
 
-            send_mail(subject, message, settings.EMAIL_HOST_USER, [recipient_email], fail_silently=False)
+            queue_email(subject, message, [recipient_email])
 
-            logger.info(f" Booking email successfully sent to {recipient_email} - Status: {status}")
-            print(f" Booking email successfully sent to {recipient_email} - Status: {status}")  #  Debugging Output
+            logger.info(f" Booking email queued for {recipient_email} - Status: {status}")
 
         except Exception as e:
-            logger.error(f" Error sending booking email to {recipient_email}: {str(e)}")
-            print(f" Error sending booking email to {recipient_email}: {str(e)}")  #  Debugging Output
+            logger.error(f" Error queueing booking email to {recipient_email}: {str(e)}")
 
     
     @action(detail=True, methods=['post'], url_path='initiate-payment')
@@ -284,7 +349,7 @@ class StudentBookingHistoryView(ListAPIView):
         if not student.is_authenticated:
             return Booking.objects.none()  #  Return empty queryset instead of unauthorized error
         
-        queryset = Booking.objects.filter(student=student)
+        queryset = BookingSerializer.optimize_queryset(Booking.objects.filter(student=student), self.request)
         print(f" DEBUG: Found {queryset.count()} bookings")  #  Log found bookings
         return queryset
 
@@ -360,7 +425,11 @@ from .models import Notification
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_student_notifications(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
+    """  ?since_id= and ?limit=/cursor paging, see NotificationPagination  """
+    paginator = NotificationPagination()
+    notifications = paginator.paginate_queryset(
+        Notification.objects.filter(user=request.user).only('id', 'message', 'is_read', 'created_at'), request
+    )
     data = [
         {
             'id': n.id,
@@ -370,7 +439,7 @@ def get_student_notifications(request):
         }
         for n in notifications
     ]
-    return Response(data)
+    return paginator.get_paginated_response(data)
 
 
 
@@ -382,6 +451,12 @@ from .models import Notification
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_all_notifications_read(request):
-    notifications = Notification.objects.filter(user=request.user, is_read=False)
-    notifications.update(is_read=True)
+    mark_all_read(Notification, request.user)
     return Response({"message": "All notifications marked as read!"})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_unread_count(request):
+    """  Notification badge count, read from the user row  """
+    return Response(unread_counts(request.user))
@@ -0,0 +1,22 @@
+// Live notifications over ws/notifications/. Pass the highest notification id
+// already shown; anything newer (missed while offline, or created later) is
+// handed to onNotifications as an array, newest first.
+export const openNotificationSocket = (lastId, onNotifications) => {
+  const token = localStorage.getItem("token");
+  if (!token) return null;
+
+  const socket = new WebSocket(
+    `ws://127.0.0.1:8001/ws/notifications/?token=${encodeURIComponent(token)}&last_id=${lastId || 0}`
+  );
+  socket.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    let incoming = [];
+    if (data.type === "backlog") incoming = data.notifications;
+    if (data.type === "notification") incoming = [data];
+    if (incoming.length > 0) onNotifications([...incoming].reverse());
+  };
+  return socket;
+};
+
+export const latestId = (notifications) =>
+  notifications.reduce((max, n) => Math.max(max, n.id), 0);
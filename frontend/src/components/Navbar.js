@@ -1,6 +1,7 @@
 import { Link, useNavigate } from "react-router-dom";
 import { useEffect, useState, useRef } from "react";
 import api from "../api/axios";
+import { openNotificationSocket, latestId } from "../api/notificationSocket";
 import "../styles/navbar.css"; // Import CSS
 import { FaBell, FaSpinner } from "react-icons/fa";
 
@@ -12,6 +13,7 @@ const Navbar = () => {
   const [unreadCount, setUnreadCount] = useState(0);
   const [loading, setLoading] = useState(false);
   const notifRef = useRef(null);
+  const notifSocketRef = useRef(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -28,8 +30,16 @@ const Navbar = () => {
 
   useEffect(() => {
     document.addEventListener("mousedown", handleClickOutside);
-    fetchNotifications();
-    return () => document.removeEventListener("mousedown", handleClickOutside);
+    fetchNotifications().then((data) => {
+      notifSocketRef.current = openNotificationSocket(latestId(data), (incoming) => {
+        setNotifications((prev) => [...incoming, ...prev]);
+        setUnreadCount((prev) => prev + incoming.filter((n) => !n.is_read).length);
+      });
+    });
+    return () => {
+      document.removeEventListener("mousedown", handleClickOutside);
+      if (notifSocketRef.current) notifSocketRef.current.close();
+    };
   }, []);
 
   const handleClickOutside = (e) => {
@@ -42,13 +52,17 @@ const Navbar = () => {
     setLoading(true);
     try {
       const token = localStorage.getItem("token");
-      const res = await api.get("/students/notifications/", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setNotifications(res.data);
-      setUnreadCount(res.data.filter((n) => !n.is_read).length);
+      const headers = { Authorization: `Bearer ${token}` };
+      const [res, counts] = await Promise.all([
+        api.get("/students/notifications/", { headers }),
+        api.get("/students/notifications/unread_count/", { headers }),
+      ]);
+      setNotifications(res.data.results);
+      setUnreadCount(counts.data.unread);
+      return res.data.results;
     } catch (err) {
       console.error(" Error fetching notifications", err);
+      return [];
     } finally {
       setLoading(false);
     }
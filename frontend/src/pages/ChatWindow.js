@@ -11,18 +11,32 @@ const ChatWindow = ({ hostelId, userId, receiverId }) => {
   const [connected, setConnected] = useState(false);
 
   useEffect(() => {
-    socketRef.current = new WebSocket(`ws://127.0.0.1:8001/ws/chat/${hostelId}/`);
+    const token = localStorage.getItem("token");
+    socketRef.current = new WebSocket(
+      `ws://127.0.0.1:8001/ws/chat/${hostelId}/?token=${encodeURIComponent(token || "")}`
+    );
 
 
 
   
+    let pingTimer = null;
+
     socketRef.current.onopen = () => {
       console.log(" WebSocket connected");
       setConnected(true);
+      // Keeps our presence alive while the window is open
+      pingTimer = setInterval(() => {
+        if (socketRef.current.readyState === WebSocket.OPEN) {
+          socketRef.current.send(JSON.stringify({ type: "ping" }));
+        }
+      }, 20000);
     };
 
     socketRef.current.onmessage = (event) => {
       const data = JSON.parse(event.data);
+      if (data.type === "pong" || data.type === "presence") {
+        return;
+      }
       console.log(" Message received:", data); // Add this
       setMessages((prev) => [...prev, data]);
     };
@@ -34,7 +48,10 @@ const ChatWindow = ({ hostelId, userId, receiverId }) => {
       setConnected(false);
     };
   
-    return () => socketRef.current.close();
+    return () => {
+      clearInterval(pingTimer);
+      socketRef.current.close();
+    };
   }, [hostelId]);
   
 
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from "react";
 import { Link, useLocation } from "react-router-dom";
 import api from "../api/axios";
+import { openNotificationSocket, latestId } from "../api/notificationSocket";
 import "../styles/Sidebar.css";
 import { 
   FaHome, FaHotel, FaBed, FaBook, FaUserGraduate, FaComment,
@@ -16,12 +17,18 @@ const Sidebar = ({ onToggle }) => {
   const [showNotificationBox, setShowNotificationBox] = useState(false);
   const [loading, setLoading] = useState(false);
   const notificationRef = useRef(null);
+  const notificationSocketRef = useRef(null);
 
   const location = useLocation();
 
   useEffect(() => {
     fetchCurrentUser();
-    fetchNotifications();
+    fetchNotifications().then((data) => {
+      notificationSocketRef.current = openNotificationSocket(latestId(data), (incoming) => {
+        setNotifications((prev) => [...incoming, ...prev]);
+        setUnreadCount((prev) => prev + incoming.filter((n) => !n.is_read).length);
+      });
+    });
 
     const storedPreference = localStorage.getItem("sidebarCollapsed");
     if (storedPreference !== null) {
@@ -38,6 +45,7 @@ const Sidebar = ({ onToggle }) => {
     document.addEventListener("mousedown", handleClickOutside);
     return () => {
       document.removeEventListener("mousedown", handleClickOutside);
+      if (notificationSocketRef.current) notificationSocketRef.current.close();
     };
   }, []);
 
@@ -69,14 +77,17 @@ const Sidebar = ({ onToggle }) => {
     setLoading(true);
     try {
       const token = localStorage.getItem("token");
-      const res = await api.get("/hostel_owner/notifications/", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setNotifications(res.data);
-      const unread = res.data.filter((n) => !n.is_read).length;
-      setUnreadCount(unread);
+      const headers = { Authorization: `Bearer ${token}` };
+      const [res, counts] = await Promise.all([
+        api.get("/hostel_owner/notifications/", { headers }),
+        api.get("/hostel_owner/notifications/unread_count/", { headers }),
+      ]);
+      setNotifications(res.data.results);
+      setUnreadCount(counts.data.unread);
+      return res.data.results;
     } catch (error) {
       console.error("Error fetching notifications:", error);
+      return [];
     } finally {
       setLoading(false);
     }